@@ -3,7 +3,7 @@ Main FastAPI application for Timelapse Manager
 """
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
@@ -12,7 +12,7 @@ import sys
 
 from .database import init_db
 from .routers import jobs, captures, videos, settings
-from .services.capture_scheduler import CaptureScheduler
+from .services.capture_scheduler import get_scheduler
 from .auth import verify_api_key
 from . import config
 
@@ -61,7 +61,7 @@ async def lifespan(app: FastAPI):
     
     # Startup
     init_db()
-    scheduler = CaptureScheduler()
+    scheduler = get_scheduler()  # Shared with the routers, which notify it of job changes
     scheduler.start()
     logger.info("Database initialized")
     logger.info(f"Capture scheduler started (Log Level: {config.LOG_LEVEL})")
@@ -79,6 +79,7 @@ app = FastAPI(
     description="Configuration and management tool for timelapse videos",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     redirect_slashes=False,
     redoc_url=None  # Disable ReDoc, use Swagger UI only
 )
@@ -19,9 +19,7 @@ def get_stored_api_key() -> Optional[str]:
     """Retrieve the API key from the database"""
     try:
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM settings WHERE key = 'api_key'")
-            row = cursor.fetchone()
+            row = conn.execute("SELECT value FROM settings WHERE key = 'api_key'").fetchone()
             return row[0] if row else None
     except Exception as e:
         logger.error(f"Error retrieving API key: {e}")
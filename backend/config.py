@@ -29,6 +29,16 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 # FFMPEG settings
 FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", 30))
 
+# HTTPS snapshot certificates are verified unless turned off (cameras with self-signed certificates)
+SNAPSHOT_VERIFY_TLS = os.getenv("SNAPSHOT_VERIFY_TLS", "true").lower() in ("1", "true", "yes")
+
+# Capture settings
+CAPTURE_WORKERS = int(os.getenv("CAPTURE_WORKERS", 8))  # Captures that may run at the same time
+MAX_CAPTURES_PER_HOST = int(os.getenv("MAX_CAPTURES_PER_HOST", 0))  # Captures per camera host at the same time (0 = no limit)
+
+# Video settings
+MAX_CONCURRENT_ENCODES = int(os.getenv("MAX_CONCURRENT_ENCODES", 2))  # Videos encoded at the same time
+
 # Timezone Configuration
 # The TZ environment variable determines the timezone for all datetime operations
 # This includes:
@@ -2,33 +2,109 @@
 Database models and initialization
 """
 import sqlite3
+import queue
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from contextlib import contextmanager
 import secrets
 import string
 from . import config
 
+# Prepared statements kept per connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+# Idle connections kept open for reuse; extra connections opened under load are closed on release.
+# Sized so every capture worker, the scheduler thread and a few API requests keep a persistent
+# connection instead of opening (and closing) one when their writes overlap.
+CONNECTION_POOL_SIZE = config.CAPTURE_WORKERS + 4
+
+# Per-connection tuning; journal_mode=WAL is persistent and set once in init_db()
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16384",  # 16 MiB page cache per pooled connection
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA wal_autocheckpoint = 1000",
+)
+
+# LIFO so the most recently used (warmest) connection is handed out first
+_pool = queue.LifoQueue(maxsize=CONNECTION_POOL_SIZE)
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection with the application's row factory and pragmas applied"""
+    # Pooled connections move between request/worker threads, but only one holds a connection at a time
+    conn = sqlite3.connect(
+        config.DATABASE_PATH,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 
 @contextmanager
 def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    Context manager for database connections.
+    Connections come from a small pool, so the schema and statement caches stay warm
+    across requests. Commits on success, rolls back on error.
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    
+    reusable = True
     try:
         yield conn
         conn.commit()
     except Exception:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            reusable = False
         raise
     finally:
-        conn.close()
+        if reusable:
+            try:
+                _pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        else:
+            conn.close()
+
+
+def prime_pool(count: int) -> None:
+    """
+    Open connections up front until the pool holds `count` idle ones (at most its size).
+    Lets a burst of parallel work - the first tick's captures - start on warm connections
+    instead of each opening its own and replaying the pragmas.
+    """
+    for _ in range(min(count, CONNECTION_POOL_SIZE) - _pool.qsize()):
+        try:
+            _pool.put_nowait(_connect())
+        except queue.Full:
+            break
+
+
+API_KEY_ALPHABET = string.ascii_letters + string.digits
 
 
 def generate_api_key(length: int = 16) -> str:
     """Generate a random alphanumeric API key"""
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    # Draw the whole key as one uniform integer (a single entropy read instead of
+    # one per character) and spell it out in base-62
+    base = len(API_KEY_ALPHABET)
+    value = secrets.randbelow(base ** length)
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, base)
+        chars.append(API_KEY_ALPHABET[index])
+    return ''.join(chars)
 
 
 def init_db():
@@ -36,6 +112,9 @@ def init_db():
     with get_db() as conn:
         cursor = conn.cursor()
         
+        # WAL lets readers proceed while the scheduler writes; the mode persists in the file
+        cursor.execute("PRAGMA journal_mode = WAL")
+        
         # Settings table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS settings (
@@ -106,8 +185,13 @@ def init_db():
         
         # Create indexes
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_captures_job_id ON captures(job_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_captures_job_captured ON captures(job_id, captured_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_job_id ON processed_videos(job_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        # One index per list_videos filter shape so ORDER BY created_at DESC LIMIT reads in index order
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pv_created ON processed_videos(created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pv_job_created ON processed_videos(job_id, created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pv_status_created ON processed_videos(status, created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pv_job_status_created ON processed_videos(job_id, status, created_at DESC)")
         
         # Migration: Add warning_message column if it doesn't exist
         cursor.execute("PRAGMA table_info(jobs)")
@@ -127,6 +211,16 @@ def init_db():
         if 'next_scheduled_capture_at' not in columns:
             cursor.execute("ALTER TABLE jobs ADD COLUMN next_scheduled_capture_at TEXT")
         
+        # Scheduler "due jobs" range scan; indexed on datetime() because stored offsets vary (DST)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_next_capture ON jobs(status, datetime(next_scheduled_capture_at))")
+        # Scheduler full pass and startup hydration filter on datetime(start_datetime)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_start ON jobs(status, datetime(start_datetime))")
+        # Both lead with status, so the old status-only index is just extra work on every status write
+        cursor.execute("DROP INDEX IF EXISTS idx_jobs_status")
+        # The UI polls list_jobs every few seconds; one index per filter shape reads ORDER BY created_at DESC LIMIT in index order
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at DESC)")
+
         # Migration: Add start_time and end_time columns to processed_videos if they don't exist
         cursor.execute("PRAGMA table_info(processed_videos)")
         video_columns = [col[1] for col in cursor.fetchall()]
@@ -151,3 +245,19 @@ def init_db():
 def dict_from_row(row: sqlite3.Row) -> Dict[str, Any]:
     """Convert a sqlite3.Row to a dictionary"""
     return dict(zip(row.keys(), row))
+
+
+def dicts_from_cursor(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """Convert all remaining rows of an executed cursor to dictionaries"""
+    # Column names are read once from the cursor instead of row.keys() per row;
+    # dict(row) is slower still, as sqlite3.Row looks each key up by name
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def iter_dicts_from_cursor(cursor: sqlite3.Cursor) -> Iterator[Dict[str, Any]]:
+    """Yield the remaining rows of an executed cursor as dictionaries, one at a time"""
+    # For single passes that keep only some rows - nothing is materialized up front
+    columns = [col[0] for col in cursor.description]
+    for row in cursor:
+        yield dict(zip(columns, row))
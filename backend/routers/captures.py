@@ -9,7 +9,7 @@ import os
 import logging
 
 from ..models import CaptureResponse, CaptureListResponse, CaptureDeleteRequest
-from ..database import get_db, dict_from_row
+from ..database import get_db, dict_from_row, dicts_from_cursor
 from ..utils import get_now, to_iso, parse_iso
 from ..services.thumbnail_generator import get_thumbnail_path, has_thumbnail, delete_thumbnail
 
@@ -81,8 +81,7 @@ async def list_captures(
         cursor.execute(query, params + [page_size, offset])
         
         captures = []
-        for row in cursor.fetchall():
-            capture_dict = dict_from_row(row)
+        for capture_dict in dicts_from_cursor(cursor):
             capture_dict['has_thumbnail'] = has_thumbnail(capture_dict['file_path'])
             capture_dict['thumbnail_path'] = get_thumbnail_path(capture_dict['file_path']) if capture_dict['has_thumbnail'] else None
             captures.append(capture_dict)
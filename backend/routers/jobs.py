@@ -1,27 +1,75 @@
 """
 Jobs API endpoints
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime
 import os
+import stat
+import shutil
+import json
 import logging
 
 from ..models import JobCreate, JobUpdate, JobResponse, TestUrlResponse, DurationEstimate, DurationCalculation, MaintenanceResult, MaintenanceCleanup, MaintenanceImport
-from ..database import get_db, dict_from_row
+from ..database import get_db, dict_from_row, dicts_from_cursor
 from ..services.url_tester import test_stream_url
 from ..services.duration_calculator import calculate_duration
 from ..services.maintenance import scan_job_files, cleanup_missing_captures, import_orphaned_files
 from ..services.job_state import calculate_job_state
+from ..services.capture_scheduler import get_scheduler
 from ..utils import get_now, to_iso, parse_iso, ensure_timezone_aware
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Static statements shared by the endpoints below. Keeping the SQL text identical
+# across calls lets sqlite3's per-connection statement cache reuse the prepared form.
+SQL_INSERT_JOB = """
+    INSERT INTO jobs (
+        name, url, stream_type, start_datetime, end_datetime,
+        interval_seconds, framerate, capture_path, naming_pattern,
+        time_window_enabled, time_window_start, time_window_end,
+        status, created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING *
+"""
+SQL_FINALIZE_NEW_JOB = """
+    UPDATE jobs SET capture_path = ?, status = ?, next_scheduled_capture_at = ?
+    WHERE id = ?
+    RETURNING *
+"""
+SQL_SELECT_JOB_BY_ID = "SELECT * FROM jobs WHERE id = ?"
+# Just the fields calculate_duration() reads
+SQL_SELECT_JOB_DURATION_FIELDS = """
+    SELECT start_datetime, end_datetime, interval_seconds, framerate,
+           time_window_enabled, time_window_start, time_window_end
+    FROM jobs WHERE id = ?
+"""
+SQL_LIST_JOBS = "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ? OFFSET ?"
+SQL_LIST_JOBS_BY_STATUS = "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ? OFFSET ?"
+SQL_LATEST_CAPTURE_FOR_JOB = "SELECT * FROM captures WHERE job_id = ? ORDER BY captured_at DESC LIMIT 1"
+# Latest capture for each job id in a JSON array - one static statement for a whole page
+SQL_LATEST_CAPTURES_FOR_JOBS = """
+    SELECT c.* FROM captures c
+    WHERE c.id IN (
+        SELECT (
+            SELECT id FROM captures
+            WHERE job_id = ids.value
+            ORDER BY captured_at DESC
+            LIMIT 1
+        )
+        FROM json_each(?) AS ids
+    )
+"""
+SQL_UPDATE_JOB_STATE = "UPDATE jobs SET status = ?, next_scheduled_capture_at = ? WHERE id = ?"
+SQL_DELETE_JOB = "DELETE FROM jobs WHERE id = ?"
 
-def enrich_job_with_next_capture(job_dict: dict) -> dict:
+
+def enrich_job_with_next_capture(job_dict: dict, now: Optional[datetime] = None) -> dict:
     """Add next_capture_at field to job dict using context-aware calculator"""
-    now = get_now()
+    if now is None:
+        now = get_now()
     pending = parse_iso(job_dict['next_scheduled_capture_at']) if job_dict.get('next_scheduled_capture_at') else None
     status, next_capture, reason = calculate_job_state(job_dict, now, pending)
     job_dict['next_capture_at'] = to_iso(next_capture) if next_capture else None
@@ -29,51 +77,52 @@ def enrich_job_with_next_capture(job_dict: dict) -> dict:
 
 
 
+def _validate_capture_dir(path: str) -> None:
+    """Ensure a capture path exists, is a directory and is writable (one stat + one access)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Capture path does not exist: {path}"
+        )
+    
+    if not stat.S_ISDIR(st.st_mode):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Capture path is not a directory: {path}"
+        )
+    
+    if not os.access(path, os.W_OK):
+        raise HTTPException(
+            status_code=400,
+            detail=f"No write permission for capture path: {path}"
+        )
+
+
 @router.post("/", response_model=JobResponse, status_code=201)
 async def create_job(job: JobCreate):
     """Create a new timelapse job"""
+    # Get default values from config if not provided
+    from .. import config
+    if not job.capture_path:
+        job.capture_path = config.DEFAULT_CAPTURES_PATH
+    
+    if not job.naming_pattern:
+        job.naming_pattern = config.DEFAULT_CAPTURE_PATTERN
+    
+    # Validate capture_path exists and is writable (off the event loop - may be a network mount)
+    await run_in_threadpool(_validate_capture_dir, job.capture_path)
+    
+    now = get_now()
+    now_str = to_iso(now)
+    
+    # Insert job first to get the ID (RETURNING hands back the row with its defaults). It is committed
+    # before its directory is created, so no write lock is held across that (possibly slow) filesystem
+    # call - and stored disabled until then, so the scheduler leaves the half-made job alone
     with get_db() as conn:
         cursor = conn.cursor()
-        
-        # Get default values from config if not provided
-        from .. import config
-        if not job.capture_path:
-            job.capture_path = config.DEFAULT_CAPTURES_PATH
-        
-        if not job.naming_pattern:
-            job.naming_pattern = config.DEFAULT_CAPTURE_PATTERN
-        
-        # Validate capture_path exists and is writable
-        if not os.path.exists(job.capture_path):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Capture path does not exist: {job.capture_path}"
-            )
-        
-        if not os.path.isdir(job.capture_path):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Capture path is not a directory: {job.capture_path}"
-            )
-        
-        if not os.access(job.capture_path, os.W_OK):
-            raise HTTPException(
-                status_code=400,
-                detail=f"No write permission for capture path: {job.capture_path}"
-            )
-        
-        now = get_now()
-        now_str = to_iso(now)
-        
-        # Insert job first to get the ID
-        cursor.execute("""
-            INSERT INTO jobs (
-                name, url, stream_type, start_datetime, end_datetime,
-                interval_seconds, framerate, capture_path, naming_pattern,
-                time_window_enabled, time_window_start, time_window_end,
-                created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        cursor.execute(SQL_INSERT_JOB, (
             job.name, job.url, job.stream_type.value,
             to_iso(job.start_datetime),
             to_iso(job.end_datetime) if job.end_datetime else None,
@@ -82,52 +131,50 @@ async def create_job(job: JobCreate):
             1 if job.time_window_enabled else 0,
             job.time_window_start if job.time_window_enabled else None,
             job.time_window_end if job.time_window_enabled else None,
-            now_str, now_str
+            'disabled', now_str, now_str
         ))
-        
-        job_id = cursor.lastrowid
-        
-        # Create job directory with ID prefix
-        job_dir = os.path.join(job.capture_path, f"{job_id}_{job.name}")
-        try:
-            os.makedirs(job_dir, exist_ok=True)
-        except PermissionError:
-            # Rollback the job creation
-            cursor.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
-            raise HTTPException(
-                status_code=400,
-                detail=f"Permission denied creating job directory: {job_dir}"
-            )
-        except Exception as e:
-            # Rollback the job creation
-            cursor.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to create job directory: {str(e)}"
-            )
-        
-        # Update the capture_path with the actual directory
-        cursor.execute("UPDATE jobs SET capture_path = ? WHERE id = ?", (job_dir, job_id))
-        
-        # Get the job we just created
-        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
         job_dict = dict_from_row(cursor.fetchone())
-        
-        # Calculate initial state
-        status, next_capture, reason = calculate_job_state(job_dict, now, pending_capture_time=None)
-        
-        # Update with calculated state
+    job_id = job_dict['id']
+    
+    # Create job directory with ID prefix
+    job_dir = os.path.join(job.capture_path, f"{job_id}_{job.name}")
+    try:
+        await run_in_threadpool(os.makedirs, job_dir, exist_ok=True)
+    except PermissionError:
+        # Rollback the job creation
+        with get_db() as conn:
+            conn.execute(SQL_DELETE_JOB, (job_id,))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Permission denied creating job directory: {job_dir}"
+        )
+    except Exception as e:
+        # Rollback the job creation
+        with get_db() as conn:
+            conn.execute(SQL_DELETE_JOB, (job_id,))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to create job directory: {str(e)}"
+        )
+    
+    # Calculate initial state of the job as enabled (capture_path does not affect scheduling)
+    job_dict['status'] = 'active'
+    status, next_capture, reason = calculate_job_state(job_dict, now, pending_capture_time=None)
+    
+    # Store the actual directory and calculated state, getting the final row back
+    with get_db() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            "UPDATE jobs SET status = ?, next_scheduled_capture_at = ? WHERE id = ?",
-            (status, to_iso(next_capture) if next_capture else None, job_id)
+            SQL_FINALIZE_NEW_JOB,
+            (job_dir, status, to_iso(next_capture) if next_capture else None, job_id)
         )
-        
-        # Get final job state
-        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
         final_job = dict_from_row(cursor.fetchone())
-        
-        logger.info(f"Created job '{job.name}' (ID: {job_id}) with status: {status} - {reason}")
-        return enrich_job_with_next_capture(final_job)
+    
+    logger.info(f"Created job '{job.name}' (ID: {job_id}) with status: {status} - {reason}")
+    
+    # Committed - queue the job in the scheduler without waiting out its current sleep
+    get_scheduler().job_updated(final_job)
+    return enrich_job_with_next_capture(final_job)
 
 
 @router.get("/", response_model=List[JobResponse])
@@ -141,34 +188,30 @@ async def list_jobs(
         cursor = conn.cursor()
         
         if status:
-            cursor.execute(
-                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                (status, limit, offset)
-            )
+            cursor.execute(SQL_LIST_JOBS_BY_STATUS, (status, limit, offset))
         else:
-            cursor.execute(
-                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                (limit, offset)
-            )
-        
-        jobs = []
-        for row in cursor.fetchall():
-            job = dict_from_row(row)
-            
-            # Get latest capture for this job
-            cursor.execute(
-                "SELECT * FROM captures WHERE job_id = ? ORDER BY captured_at DESC LIMIT 1",
-                (job['id'],)
-            )
-            latest_capture_row = cursor.fetchone()
-            if latest_capture_row:
-                job['latest_capture'] = dict_from_row(latest_capture_row)
-            else:
-                job['latest_capture'] = None
-            
-            jobs.append(enrich_job_with_next_capture(job))
+            cursor.execute(SQL_LIST_JOBS, (limit, offset))
+        
+        jobs = dicts_from_cursor(cursor)
+        
+        # Get latest capture for every job on the page in one query
+        cursor.execute(SQL_LATEST_CAPTURES_FOR_JOBS, (json.dumps([job['id'] for job in jobs]),))
+        last_capture_map = {capture['job_id']: capture for capture in dicts_from_cursor(cursor)}
+    
+    now = get_now()
+    for job in jobs:
+        job['latest_capture'] = last_capture_map.get(job['id'])
         
-        return jobs
+        if job['latest_capture'] is None and job['status'] != 'disabled':
+            # Fresh job: until it starts, its next capture is simply the start time
+            start_dt = parse_iso(job['start_datetime'])
+            if now < start_dt:
+                job['next_capture_at'] = to_iso(start_dt)
+                continue
+        
+        enrich_job_with_next_capture(job, now)
+    
+    return jobs
 
 
 @router.get("/{job_id}", response_model=JobResponse)
@@ -176,7 +219,7 @@ async def get_job(job_id: int):
     """Get a specific job by ID"""
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        cursor.execute(SQL_SELECT_JOB_BY_ID, (job_id,))
         row = cursor.fetchone()
         
         if not row:
@@ -185,10 +228,7 @@ async def get_job(job_id: int):
         job = dict_from_row(row)
         
         # Get latest capture for this job
-        cursor.execute(
-            "SELECT * FROM captures WHERE job_id = ? ORDER BY captured_at DESC LIMIT 1",
-            (job_id,)
-        )
+        cursor.execute(SQL_LATEST_CAPTURE_FOR_JOB, (job_id,))
         latest_capture_row = cursor.fetchone()
         if latest_capture_row:
             job['latest_capture'] = dict_from_row(latest_capture_row)
@@ -205,8 +245,11 @@ async def update_job(job_id: int, job_update: JobUpdate):
     with get_db() as conn:
         cursor = conn.cursor()
         
+        # Read-modify-write: take the write lock up front so the transaction never has to upgrade
+        cursor.execute("BEGIN IMMEDIATE")
+        
         # Check if job exists and get current job data
-        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        cursor.execute(SQL_SELECT_JOB_BY_ID, (job_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Job not found")
@@ -320,7 +363,7 @@ async def update_job(job_id: int, job_update: JobUpdate):
         cursor.execute(query, values)
         
         # Reload job with updates
-        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        cursor.execute(SQL_SELECT_JOB_BY_ID, (job_id,))
         updated_job = dict_from_row(cursor.fetchone())
         
         # Recalculate state using state manager if needed (within same transaction)
@@ -329,44 +372,48 @@ async def update_job(job_id: int, job_update: JobUpdate):
             pending = parse_iso(updated_job['next_scheduled_capture_at']) if updated_job.get('next_scheduled_capture_at') else None
             new_status, next_capture, reason = calculate_job_state(updated_job, get_now(), pending)
             
-            cursor.execute(
-                "UPDATE jobs SET status = ?, next_scheduled_capture_at = ? WHERE id = ?",
-                (new_status, to_iso(next_capture) if next_capture else None, job_id)
-            )
+            next_capture_iso = to_iso(next_capture) if next_capture else None
+            cursor.execute(SQL_UPDATE_JOB_STATE, (new_status, next_capture_iso, job_id))
             
-            # Reload with new state
-            cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
-            updated_job = dict_from_row(cursor.fetchone())
+            # Only these two columns changed - patch the loaded row instead of re-reading it
+            updated_job['status'] = new_status
+            updated_job['next_scheduled_capture_at'] = next_capture_iso
             logger.info(f"Job {job_id}: Schedule updated, new status: {new_status} - {reason}")
             
         elif job_update.status is not None and job_update.status.value == 'active':
             # Re-enabling - recalculate state
             new_status, next_capture, reason = calculate_job_state(updated_job, get_now(), pending_capture_time=None)
             
-            cursor.execute(
-                "UPDATE jobs SET status = ?, next_scheduled_capture_at = ? WHERE id = ?",
-                (new_status, to_iso(next_capture) if next_capture else None, job_id)
-            )
+            next_capture_iso = to_iso(next_capture) if next_capture else None
+            cursor.execute(SQL_UPDATE_JOB_STATE, (new_status, next_capture_iso, job_id))
             
-            # Reload with new state
-            cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
-            updated_job = dict_from_row(cursor.fetchone())
+            updated_job['status'] = new_status
+            updated_job['next_scheduled_capture_at'] = next_capture_iso
             logger.info(f"Job {job_id}: Re-enabled, new status: {new_status} - {reason}")
         
         # Log changes
         changes = [f"{field}" for field in job_update.model_fields_set]
         if changes:
             logger.info(f"Updated job '{current_job['name']}' (ID: {job_id}) - Changed: {', '.join(changes)}")
-        
-        return enrich_job_with_next_capture(updated_job)
+    
+    # Committed - a changed schedule may move the next capture earlier
+    get_scheduler().job_updated(updated_job)
+    return enrich_job_with_next_capture(updated_job)
+
+
+def _delete_job_folder(job_folder: str) -> None:
+    """Remove a deleted job's capture folder (runs as a background task after the response)"""
+    try:
+        if os.path.isdir(job_folder):
+            shutil.rmtree(job_folder)
+            logger.info(f"Deleted job folder: {job_folder}")
+    except Exception as e:
+        logger.warning(f"Failed to delete job folder {job_folder}: {e}")
 
 
 @router.delete("/{job_id}", status_code=204)
-async def delete_job(job_id: int, delete_captures: bool = False):
+async def delete_job(job_id: int, background_tasks: BackgroundTasks, delete_captures: bool = False):
     """Delete a job and optionally its capture files"""
-    import os
-    import shutil
-    
     with get_db() as conn:
         cursor = conn.cursor()
         
@@ -378,19 +425,14 @@ async def delete_job(job_id: int, delete_captures: bool = False):
         
         job_name, job_folder = row
         
-        # Delete the entire job folder if requested
-        if delete_captures and job_folder:
-            try:
-                if os.path.exists(job_folder) and os.path.isdir(job_folder):
-                    shutil.rmtree(job_folder)
-                    logger.info(f"Deleted job folder: {job_folder}")
-            except Exception as e:
-                logger.warning(f"Failed to delete job folder {job_folder}: {e}")
-        
         # Delete job (cascades to captures and videos records in DB)
-        cursor.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
-        
-        logger.info(f"Deleted job '{job_name}' (ID: {job_id}) - Captures deleted from disk: {delete_captures}")
+        cursor.execute(SQL_DELETE_JOB, (job_id,))
+    
+    # Removing tens of thousands of images can take minutes - do it after responding
+    if delete_captures and job_folder:
+        background_tasks.add_task(_delete_job_folder, job_folder)
+    
+    logger.info(f"Deleted job '{job_name}' (ID: {job_id}) - Captures deleted from disk: {delete_captures}")
 
 
 @router.post("/test-url", response_model=TestUrlResponse)
@@ -409,7 +451,7 @@ async def estimate_duration(
     """Calculate estimated video duration based on capture settings"""
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        cursor.execute(SQL_SELECT_JOB_DURATION_FIELDS, (job_id,))
         job = cursor.fetchone()
         
         if not job:
@@ -5,20 +5,87 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
 from fastapi.responses import FileResponse
 from typing import List, Optional
 from datetime import datetime
+from functools import lru_cache
 import os
+import stat
+import time
 import logging
 
 from ..models import VideoCreate, VideoResponse
-from ..database import get_db, dict_from_row
-from ..services.video_processor import process_video
+from ..database import get_db, dict_from_row, dicts_from_cursor
+from ..services.video_processor import queue_video, get_encode_in_progress, register_encode
 from ..utils import get_now, to_iso
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+SQL_SELECT_VIDEO_WITH_JOB = """
+    SELECT v.*, j.name as job_name
+    FROM processed_videos v
+    LEFT JOIN jobs j ON v.job_id = j.id
+"""
+
+
+def _build_list_videos_statements() -> dict:
+    """One fixed statement per filter combination, keyed by (has_job_id, has_status)"""
+    statements = {}
+    for has_job_id in (False, True):
+        for has_status in (False, True):
+            conditions = []
+            if has_job_id:
+                conditions.append("v.job_id = :job_id")
+            if has_status:
+                conditions.append("v.status = :status")
+            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            statements[(has_job_id, has_status)] = f"""
+                {SQL_SELECT_VIDEO_WITH_JOB}
+                {where_clause}
+                ORDER BY v.created_at DESC LIMIT :limit OFFSET :offset
+            """
+    return statements
+
+
+# Fixed SQL text per filter shape keeps every list call a statement-cache hit
+LIST_VIDEOS_STATEMENTS = _build_list_videos_statements()
+
+# How long a successful output path check is reused
+OUTPUT_PATH_CHECK_TTL_SECONDS = 30
+
+
+class VideoFileResponse(FileResponse):
+    """FileResponse reading 1 MiB per chunk (default 64 KiB) - videos can be several GB"""
+    chunk_size = 1 << 20
+
+
+@lru_cache(maxsize=64)
+def _validate_output_path(path: str, epoch: int) -> None:
+    """
+    Ensure an output path exists, is a directory and is writable (one stat + one access).
+    Successful checks are cached per (path, epoch); failures raise and are never cached.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Output path does not exist: {path}"
+        )
+    
+    if not stat.S_ISDIR(st.st_mode):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Output path is not a directory: {path}"
+        )
+    
+    if not os.access(path, os.W_OK):
+        raise HTTPException(
+            status_code=400,
+            detail=f"No write permission for output path: {path}"
+        )
+
 
 @router.post("/", response_model=VideoResponse, status_code=201)
-async def create_video(video: VideoCreate, background_tasks: BackgroundTasks):
+def create_video(video: VideoCreate, background_tasks: BackgroundTasks):
     """Create a new processed video from captures"""
     with get_db() as conn:
         cursor = conn.cursor()
@@ -31,35 +98,38 @@ async def create_video(video: VideoCreate, background_tasks: BackgroundTasks):
         
         job_dict = dict_from_row(job)
         
-        # Get video output path from custom path or settings
+        # Get video output path from custom path or settings - checked before taking the write lock,
+        # so filesystem calls (and a rejected path) never hold up other writers
         if video.output_path:
             videos_path = video.output_path
             
             # Validate custom path
-            if not os.path.exists(videos_path):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Output path does not exist: {videos_path}"
-                )
-            
-            if not os.path.isdir(videos_path):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Output path is not a directory: {videos_path}"
-                )
-            
-            if not os.access(videos_path, os.W_OK):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"No write permission for output path: {videos_path}"
-                )
+            _validate_output_path(videos_path, int(time.time()) // OUTPUT_PATH_CHECK_TTL_SECONDS)
         else:
             from .. import config
             videos_path = config.DEFAULT_VIDEOS_PATH
         
+        output_path = os.path.join(videos_path, f"{video.name}.mp4")
+        
+        # Single write transaction, committed once on exit. Taking the write lock before the
+        # duplicate check serializes concurrent identical requests.
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # An identical request already queued or encoding returns that video instead of a second ffmpeg run
+        encode_key = (
+            video.job_id, video.start_capture_id, video.end_capture_id, video.start_time,
+            video.end_time, video.resolution, video.framerate, video.quality, video.output_path
+        )
+        existing_id = get_encode_in_progress(encode_key)
+        if existing_id is not None:
+            cursor.execute(SQL_SELECT_VIDEO_WITH_JOB + " WHERE v.id = ? AND v.status = 'processing'", (existing_id,))
+            existing = cursor.fetchone()
+            if existing:
+                logger.info(f"Video request for job '{job_dict['name']}' (ID: {video.job_id}) matches video {existing_id} in progress - reusing it")
+                return dict_from_row(existing)
+        
         # Create video record - name already includes timestamp from frontend
         now = to_iso(get_now())
-        output_path = os.path.join(videos_path, f"{video.name}.mp4")
         
         cursor.execute("""
             INSERT INTO processed_videos (
@@ -74,12 +144,14 @@ async def create_video(video: VideoCreate, background_tasks: BackgroundTasks):
         ))
         
         video_id = cursor.lastrowid
+        # Registered under the write lock, so a concurrent duplicate waits and then sees it
+        register_encode(encode_key, video_id)
         
         logger.info(f"Started video processing for job '{job_dict['name']}' (ID: {video.job_id}) - Video: {video.name}, Resolution: {video.resolution}, FPS: {video.framerate}")
         
-        # Start video processing in background
+        # Hand the video to the encode workers once the response (and this commit) is out
         background_tasks.add_task(
-            process_video,
+            queue_video,
             video_id=video_id,
             job_dict=job_dict,
             resolution=video.resolution,
@@ -89,15 +161,35 @@ async def create_video(video: VideoCreate, background_tasks: BackgroundTasks):
             end_capture_id=video.end_capture_id,
             start_time=video.start_time,
             end_time=video.end_time,
-            output_path=output_path
+            output_path=output_path,
+            encode_key=encode_key
         )
         
-        cursor.execute("SELECT * FROM processed_videos WHERE id = ?", (video_id,))
-        return dict_from_row(cursor.fetchone())
+        # Every column of the new row is known here - no need to read it back
+        return {
+            'id': video_id,
+            'job_id': video.job_id,
+            'name': video.name,
+            'file_path': output_path,
+            'file_size': 0,
+            'resolution': video.resolution,
+            'framerate': video.framerate,
+            'quality': video.quality,
+            'start_capture_id': video.start_capture_id,
+            'end_capture_id': video.end_capture_id,
+            'start_time': video.start_time,
+            'end_time': video.end_time,
+            'total_frames': 0,
+            'duration_seconds': 0,
+            'status': 'processing',
+            'progress': 0,
+            'created_at': now,
+            'completed_at': None
+        }
 
 
 @router.get("/", response_model=List[VideoResponse])
-async def list_videos(
+def list_videos(
     job_id: Optional[int] = Query(None, description="Filter by job ID"),
     status: Optional[str] = Query(None, description="Filter by status"),
     limit: int = Query(100, ge=1, le=1000),
@@ -107,40 +199,17 @@ async def list_videos(
     with get_db() as conn:
         cursor = conn.cursor()
         
-        query = """
-            SELECT v.*, j.name as job_name
-            FROM processed_videos v
-            LEFT JOIN jobs j ON v.job_id = j.id
-            WHERE 1=1
-        """
-        params = []
-        
-        if job_id is not None:
-            query += " AND v.job_id = ?"
-            params.append(job_id)
-        
-        if status is not None:
-            query += " AND v.status = ?"
-            params.append(status)
-        
-        query += " ORDER BY v.created_at DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
-        
-        cursor.execute(query, params)
-        return [dict_from_row(row) for row in cursor.fetchall()]
+        query = LIST_VIDEOS_STATEMENTS[(job_id is not None, status is not None)]
+        cursor.execute(query, {"job_id": job_id, "status": status, "limit": limit, "offset": offset})
+        return dicts_from_cursor(cursor)
 
 
 @router.get("/{video_id}", response_model=VideoResponse)
-async def get_video(video_id: int):
+def get_video(video_id: int):
     """Get a specific video by ID"""
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT v.*, j.name as job_name
-            FROM processed_videos v
-            LEFT JOIN jobs j ON v.job_id = j.id
-            WHERE v.id = ?
-        """, (video_id,))
+        cursor.execute(SQL_SELECT_VIDEO_WITH_JOB + " WHERE v.id = ?", (video_id,))
         row = cursor.fetchone()
         
         if not row:
@@ -150,7 +219,7 @@ async def get_video(video_id: int):
 
 
 @router.get("/{video_id}/check")
-async def check_video_file(video_id: int):
+def check_video_file(video_id: int):
     """Check if video file exists and is accessible"""
     with get_db() as conn:
         cursor = conn.cursor()
@@ -175,7 +244,7 @@ async def check_video_file(video_id: int):
 
 
 @router.get("/{video_id}/download")
-async def download_video(video_id: int):
+def download_video(video_id: int):
     """Download a processed video file"""
     with get_db() as conn:
         cursor = conn.cursor()
@@ -190,24 +259,28 @@ async def download_video(video_id: int):
         if status != "completed":
             raise HTTPException(status_code=400, detail="Video is not ready for download")
         
-        if not os.path.exists(file_path):
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
             raise HTTPException(status_code=404, detail="Video file not found on disk")
         
-        return FileResponse(
+        # Hand over the stat we already have so FileResponse doesn't stat the file again
+        return VideoFileResponse(
             file_path,
             media_type="video/mp4",
-            filename=f"{name}.mp4"
+            filename=f"{name}.mp4",
+            stat_result=file_stat
         )
 
 
 @router.delete("/{video_id}", status_code=204)
-async def delete_video(video_id: int):
+def delete_video(video_id: int):
     """Delete a processed video"""
     with get_db() as conn:
         cursor = conn.cursor()
         
-        # Get video info
-        cursor.execute("SELECT name, file_path FROM processed_videos WHERE id = ?", (video_id,))
+        # Delete record and get its info in one statement
+        cursor.execute("DELETE FROM processed_videos WHERE id = ? RETURNING name, file_path", (video_id,))
         row = cursor.fetchone()
         
         if not row:
@@ -215,11 +288,10 @@ async def delete_video(video_id: int):
         
         name, file_path = row
         
-        # Delete file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        # Delete record
-        cursor.execute("DELETE FROM processed_videos WHERE id = ?", (video_id,))
+        # Delete file if it exists (any other error rolls the record delete back)
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
         
         logger.info(f"Deleted video '{name}' (ID: {video_id})")
@@ -2,20 +2,131 @@
 Capture scheduler service - manages automatic image captures for all active jobs
 REFACTORED: Uses context-aware job_state calculator
 """
+import heapq
+import json
 import threading
 import time
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from urllib.parse import urlsplit
 
-from ..database import get_db, dict_from_row
+from .. import config
+from ..database import get_db, dicts_from_cursor, iter_dicts_from_cursor, prime_pool
 from ..utils import get_now, to_iso, parse_iso
-from .image_capture import capture_image
-from .job_state import calculate_job_state, should_execute_capture
+from .image_capture import capture_image_file, record_captures
+from .job_state import calculate_job_state, should_execute_capture, job_schedule
 
 logger = logging.getLogger(__name__)
 
+# How often every active/sleeping job is re-evaluated (window opens, warning clears).
+# Each full pass that changes nothing doubles the gap, up to the MAX; any change resets it.
+RECONCILE_INTERVAL_SECONDS = 60
+RECONCILE_INTERVAL_MAX_SECONDS = 480
+
+# The schedule heap is rebuilt once it holds more than FACTOR x live entries + MIN
+HEAP_COMPACT_FACTOR = 2
+HEAP_COMPACT_MIN = 64
+
+# Columns the status pass reads (job_state and _update_job_status) - the scheduler never selects *
+JOB_SCHEDULE_COLUMNS = """
+    jobs.id, jobs.name, jobs.status, jobs.start_datetime, jobs.end_datetime, jobs.interval_seconds,
+    jobs.time_window_enabled, jobs.time_window_start, jobs.time_window_end,
+    jobs.next_scheduled_capture_at, jobs.warning_message
+"""
+
+# ...plus what capture_image_file() and the per-host limit need, for rows that may be captured this tick
+JOB_CAPTURE_COLUMNS = JOB_SCHEDULE_COLUMNS + """,
+    jobs.url, jobs.stream_type, jobs.capture_path, jobs.naming_pattern, jobs.capture_count
+"""
+
+# Jobs the in-memory queue found due, fetched by primary key - ids go in as one JSON array,
+# so it stays one static statement (a statement-cache hit) however many jobs are due.
+# CROSS JOIN keeps json_each as the outer loop: one rowid lookup per id, never a status scan
+SQL_SELECT_JOBS_BY_ID = f"""
+    SELECT {JOB_CAPTURE_COLUMNS} FROM json_each(?) AS ids
+    CROSS JOIN jobs ON jobs.id = ids.value
+    WHERE jobs.status IN ('active', 'sleeping')
+    ORDER BY datetime(jobs.next_scheduled_capture_at)
+"""
+
+# Full pass in one statement: every job whose next capture has arrived (including any the
+# queue doesn't know about), plus started jobs that are still waiting for theirs.
+# Include jobs with pending captures even if past end_datetime
+SQL_SELECT_RECONCILE_JOBS = f"""
+    SELECT {JOB_CAPTURE_COLUMNS} FROM jobs
+    WHERE status IN ('active', 'sleeping')
+    AND (
+        datetime(next_scheduled_capture_at) <= datetime(?)
+        OR (
+            datetime(start_datetime) <= datetime(?)
+            AND (
+                end_datetime IS NULL 
+                OR datetime(end_datetime) >= datetime(?)
+                OR (
+                    next_scheduled_capture_at IS NOT NULL
+                    AND datetime(next_scheduled_capture_at) <= datetime(end_datetime)
+                )
+            )
+        )
+    )
+    ORDER BY datetime(next_scheduled_capture_at)
+"""
+
+# Startup hydration: every job that may need scheduling (its status pass only)
+SQL_SELECT_SCHEDULED_JOBS = f"""
+    SELECT {JOB_SCHEDULE_COLUMNS} FROM jobs
+    WHERE status IN ('active', 'sleeping')
+"""
+
+# Rows of jobs whose capture just finished, whatever their status now (missing = deleted meanwhile)
+SQL_SELECT_CAPTURED_JOBS = f"""
+    SELECT {JOB_SCHEDULE_COLUMNS} FROM json_each(?) AS ids
+    CROSS JOIN jobs ON jobs.id = ids.value
+"""
+
+# Post-capture schedule writes, batched per tick - with and without a warning change
+SQL_UPDATE_CAPTURED_JOB = """
+    UPDATE jobs SET status = ?, next_scheduled_capture_at = ?, updated_at = ?
+    WHERE id = ?
+"""
+SQL_UPDATE_CAPTURED_JOB_WARNING = """
+    UPDATE jobs SET status = ?, next_scheduled_capture_at = ?, updated_at = ?, warning_message = ?
+    WHERE id = ?
+"""
+
+# Status/next-capture corrections collected over a pass and written with one executemany
+SQL_UPDATE_JOB_STATUS = """
+    UPDATE jobs SET status = ?, next_scheduled_capture_at = ?, warning_message = NULL, updated_at = ?
+    WHERE id = ?
+"""
+
+
+@dataclass(slots=True)
+class JobRuntimeState:
+    """
+    The scheduler's in-memory state for one job.
+    Kept in a single map so the hot paths make one dict probe per job instead of one per field;
+    an entry is dropped once it is back to all defaults.
+    """
+    next_capture: Optional[float] = None  # Queued capture (POSIX timestamp); None = not queued
+    failures: int = 0  # Consecutive capture failures
+    in_progress: bool = False  # Being captured (or waiting for its host or result write-back)
+
+
+@dataclass(slots=True)
+class CaptureResult:
+    """Outcome of one capture, handed from its worker to the scheduler thread (slotted - no per-instance dict)"""
+    job_id: int
+    capture_time: datetime
+    update_warning: bool = False  # Write warning_message along with the schedule
+    warning_message: Optional[str] = None
+    captured: Optional[Tuple[str, int, str]] = None  # (file_path, file_size, captured_at), recorded with the schedule
+
 
 class CaptureScheduler:
     """Background service to schedule and execute captures for all active jobs"""
@@ -23,11 +134,21 @@ class CaptureScheduler:
     def __init__(self):
         self.running = False
         self.thread = None
-        self.scheduled_captures: Dict[int, datetime] = {}  # job_id -> next scheduled capture time (in-memory queue)
-        self.failure_counts: Dict[int, int] = {}  # Track consecutive failures per job
-        self.captures_in_progress: set = set()  # Track job_ids currently being captured to prevent duplicates
-        self.executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="capture-worker")  # Parallel capture execution
+        self.job_states: Dict[int, JobRuntimeState] = {}  # job_id -> queued capture, failure streak, in-progress flag
+        self._scheduled_count = 0  # job_states entries with a queued capture
+        self._heap: List[Tuple[float, int]] = []  # (timestamp, job_id) min-heap over queued captures; stale entries skipped
+        self._due_job_ids: set = set()  # job_ids taken off the heap (or deferred) for the next tick to fetch
+        self._completed_captures: List[CaptureResult] = []  # Finished captures for the next tick to write back
+        self.executor = ThreadPoolExecutor(max_workers=config.CAPTURE_WORKERS, thread_name_prefix="capture-worker")  # Parallel capture execution
+        self._capture_slots = threading.BoundedSemaphore(config.CAPTURE_WORKERS * 2)  # Running + queued captures
+        self._captures_deferred = False  # A capture was deferred for lack of a slot; re-check when one frees up
+        self._host_active: Dict[str, int] = {}  # camera host -> captures submitted (MAX_CAPTURES_PER_HOST)
+        self._host_waiting: Dict[str, deque] = {}  # camera host -> (job, capture_time) waiting for that host
         self._lock = threading.Lock()  # Lock for thread-safe operations on shared data
+        self._cond = threading.Condition(self._lock)  # Signalled when the schedule changes
+        self._wake_requested = False  # Set with _cond held to run a check before the heap says so
+        self._next_reconcile_at = 0.0  # time.monotonic() of the next full status pass
+        self._reconcile_interval = RECONCILE_INTERVAL_SECONDS  # Current gap between full passes (backs off while idle)
     
     def start(self):
         """Start the scheduler thread"""
@@ -35,69 +156,174 @@ class CaptureScheduler:
             logger.warning("Scheduler already running")
             return
         
+        # Every capture worker records its capture through a pooled connection - have one ready for each
+        prime_pool(config.CAPTURE_WORKERS + 1)
+        
         # Hydrate in-memory queue from database on startup
         self._hydrate_from_database()
         
         self.running = True
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
-        logger.info(f"Capture scheduler started with {len(self.scheduled_captures)} jobs in queue")
+        logger.info(f"Capture scheduler started with {self._scheduled_count} jobs in queue")
     
     def stop(self):
         """Stop the scheduler thread"""
-        self.running = False
+        with self._cond:
+            self.running = False
+            self._cond.notify()
         if self.thread:
             self.thread.join(timeout=5)
         self.executor.shutdown(wait=True, cancel_futures=False)
+        
+        # Store the next schedule of captures that finished after the loop's last tick
+        with self._cond:
+            completed = self._completed_captures
+            self._completed_captures = []
+        if completed:
+            with get_db() as conn:
+                next_checks = self._apply_completed_captures(conn, completed)
+            self._finish_captures(next_checks)
         logger.info("Capture scheduler stopped")
     
     def is_running(self):
         """Check if scheduler is running"""
         return self.running
     
+    def job_updated(self, job: dict):
+        """Re-queue a job after the API committed changes to it, waking the loop"""
+        next_capture = None
+        if job['status'] in ('active', 'sleeping') and job.get('next_scheduled_capture_at'):
+            next_capture = parse_iso(job['next_scheduled_capture_at'])
+        
+        with self._cond:
+            self._queue_next_check(job['id'], next_capture)
+            self._reconcile_interval = RECONCILE_INTERVAL_SECONDS
+            self._wake_requested = True
+            self._cond.notify()
+    
+    def _queue_next_check(self, job_id: int, next_capture: Optional[datetime]) -> None:
+        """Record a job's next scheduled capture (None unschedules it); caller holds self._cond"""
+        state = self.job_states.get(job_id)
+        if next_capture is None:
+            if state is not None:
+                if state.next_capture is not None:
+                    state.next_capture = None
+                    self._scheduled_count -= 1
+                self._drop_idle_state(job_id, state)
+            return
+        
+        # The queue keeps float timestamps - cheaper to compare and sift than aware datetimes,
+        # and the wait timeout is a plain subtraction from time.time()
+        next_ts = next_capture.timestamp()
+        if state is None:
+            state = self.job_states[job_id] = JobRuntimeState()
+        if state.next_capture != next_ts:
+            if state.next_capture is None:
+                self._scheduled_count += 1
+            state.next_capture = next_ts
+            heapq.heappush(self._heap, (next_ts, job_id))
+            
+            # Rescheduled entries stay in the heap until they reach the head; rebuild from the
+            # live schedule once they outnumber it, so frequent edits can't grow it unbounded
+            if len(self._heap) > HEAP_COMPACT_FACTOR * self._scheduled_count + HEAP_COMPACT_MIN:
+                self._heap = [
+                    (queued.next_capture, queued_id) for queued_id, queued in self.job_states.items()
+                    if queued.next_capture is not None
+                ]
+                heapq.heapify(self._heap)
+    
+    def _drop_idle_state(self, job_id: int, state: JobRuntimeState) -> None:
+        """Forget a job's runtime state once nothing in it is set; caller holds self._cond"""
+        if state.next_capture is None and not state.in_progress and not state.failures:
+            del self.job_states[job_id]
+    
+    def _is_queued(self, job_id: int, next_ts: float) -> bool:
+        """Whether a heap entry is the job's live schedule (not superseded); caller holds self._cond"""
+        state = self.job_states.get(job_id)
+        return state is not None and state.next_capture == next_ts
+    
     def _run_loop(self):
-        """Main scheduler loop - runs every 10 seconds"""
+        """Main scheduler loop - sleeps until the next capture is due or the schedule changes"""
         while self.running:
             try:
                 self._check_and_capture()
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {e}", exc_info=True)
             
-            # Sleep for 10 seconds before next check
-            time.sleep(10)
+            self._wait_for_due_jobs()
+    
+    def _wait_for_due_jobs(self):
+        """Block until the earliest queued capture or the next full pass is due, or a job changes"""
+        with self._cond:
+            while self.running and not self._wake_requested:
+                # Drop superseded entries so the head is a live schedule
+                while self._heap and not self._is_queued(self._heap[0][1], self._heap[0][0]):
+                    heapq.heappop(self._heap)
+                
+                timeout = self._next_reconcile_at - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - time.time())
+                if timeout <= 0:
+                    break
+                self._cond.wait(timeout)
+            self._wake_requested = False
+            
+            # Hand due entries to the tick, which fetches and re-queues every job it processes
+            now_ts = time.time()
+            while self._heap and self._heap[0][0] <= now_ts:
+                next_ts, job_id = heapq.heappop(self._heap)
+                if self._is_queued(job_id, next_ts):
+                    state = self.job_states[job_id]
+                    state.next_capture = None
+                    self._scheduled_count -= 1
+                    self._drop_idle_state(job_id, state)
+                    self._due_job_ids.add(job_id)
     
     def _hydrate_from_database(self):
         """Load all active/sleeping jobs and their schedules into memory on startup"""
         now = get_now()
+        now_iso = to_iso(now)
         
         with get_db() as conn:
-            cursor = conn.cursor()
-            # Get all jobs that might need scheduling (not disabled/completed)
-            cursor.execute("""
-                SELECT * FROM jobs
-                WHERE status IN ('active', 'sleeping')
-                AND datetime(start_datetime) <= datetime(?)
-            """, (to_iso(now),))
+            # Get all jobs that might need scheduling (not disabled/completed), including
+            # ones that haven't started yet - their first check is at start_datetime
+            cursor = conn.execute(SQL_SELECT_SCHEDULED_JOBS)
             
-            jobs = [dict_from_row(row) for row in cursor.fetchall()]
-        
-        for job in jobs:
-            job_id = job['id']
+            # Queue every job and bring stale rows up to date in one batch (rows are streamed -
+            # only the small update/queue tuples are kept, not every job dict)
+            status_updates = []
+            next_checks = []
+            now_in_window = {}
+            for job in iter_dicts_from_cursor(cursor):
+                update, next_check = self._update_job_status(job, now, now_iso, now_in_window)
+                next_checks.append((job['id'], next_check))
+                if update:
+                    status_updates.append(update)
             
-            # Calculate state with pending capture awareness
-            pending = parse_iso(job['next_scheduled_capture_at']) if job.get('next_scheduled_capture_at') else None
-            status, next_capture, reason = calculate_job_state(job, now, pending)
-            
-            if status == 'active' and next_capture:
-                self.scheduled_captures[job_id] = next_capture
-                logger.debug(f"Loaded scheduled capture for job {job_id}: {to_iso(next_capture)}")
+            self._queue_next_checks(next_checks)
+            if status_updates:
+                conn.executemany(SQL_UPDATE_JOB_STATUS, status_updates)
+        
+        # Every active/sleeping job was just evaluated - the loop's first tick needn't repeat the full pass
+        self._next_reconcile_at = time.monotonic() + RECONCILE_INTERVAL_SECONDS
         
-        logger.info(f"Hydrated {len(self.scheduled_captures)} scheduled captures from database")
+        logger.info(f"Hydrated {self._scheduled_count} scheduled captures from database")
     
-    def _update_job_status(self, job: dict, now: datetime) -> None:
+    def _update_job_status(
+        self,
+        job: dict,
+        now: datetime,
+        now_iso: str,
+        now_in_window: Dict[Callable[..., bool], bool]
+    ) -> Tuple[Optional[tuple], Optional[datetime]]:
         """
         Update job status based on current conditions.
         Uses context-aware calculator that understands pending captures.
+        now_in_window is the pass's memo of "is now inside this window" - jobs sharing a window
+        (the predicates are cached per window) get it answered once per pass.
+        Returns (SQL_UPDATE_JOB_STATUS parameters if the row needs writing, next check to queue),
+        so the caller can flush a whole pass with one executemany and one _queue_next_checks().
         """
         job_id = job['id']
         current_status = job['status']
@@ -105,23 +331,38 @@ class CaptureScheduler:
         # Get pending capture if one exists
         pending = parse_iso(job['next_scheduled_capture_at']) if job.get('next_scheduled_capture_at') else None
         
+        # Fast path for most jobs on a full pass: a started, active job whose pending capture is still
+        # ahead keeps it (with a time window, only while now and the capture are both inside it).
+        # That is what calculate_job_state() returns, and nothing needs writing - skip building it.
+        if current_status == 'active' and pending is not None and pending > now:
+            schedule = job_schedule(job)
+            in_window = schedule.in_window
+            if now >= schedule.start:
+                if in_window is None:
+                    return None, pending
+                current_in_window = now_in_window.get(in_window)
+                if current_in_window is None:
+                    current_in_window = now_in_window[in_window] = in_window(now.time())
+                if current_in_window and in_window(pending.time()):
+                    return None, pending
+        
         # Calculate correct state with full context
         # Important: passing pending ensures we don't recalculate next capture if one is already scheduled
         new_status, next_capture, reason = calculate_job_state(job, now, pending)
         
         # Update database if status changed OR if next_capture changed OR if we need to clear warning for sleeping jobs
-        next_capture_iso = to_iso(next_capture) if next_capture else None
+        # (a kept pending capture is the very object parsed above - reuse the stored string instead of re-formatting it)
         current_next_capture_iso = job.get('next_scheduled_capture_at')
+        if next_capture is not None and next_capture is pending:
+            next_capture_iso = current_next_capture_iso
+        else:
+            next_capture_iso = to_iso(next_capture) if next_capture else None
         has_warning = job.get('warning_message') is not None
         should_clear_warning = has_warning and new_status in ('sleeping', 'completed', 'disabled')
         
+        update = None
         if new_status != current_status or next_capture_iso != current_next_capture_iso or should_clear_warning:
-            with get_db() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE jobs SET status = ?, next_scheduled_capture_at = ?, warning_message = NULL, updated_at = ? WHERE id = ?",
-                    (new_status, next_capture_iso, to_iso(now), job_id)
-                )
+            update = (new_status, next_capture_iso, now_iso, job_id)
             job['status'] = new_status
             job['next_scheduled_capture_at'] = next_capture_iso
             job['warning_message'] = None
@@ -129,177 +370,331 @@ class CaptureScheduler:
             if new_status != current_status:
                 logger.info(f"Job {job_id} ({job['name']}) status: {current_status} -> {new_status} - {reason}")
             if next_capture_iso != current_next_capture_iso:
-                logger.debug(f"Job {job_id} ({job['name']}) next_scheduled_capture_at updated: {current_next_capture_iso} -> {next_capture_iso}")
+                logger.debug("Job %s (%s) next_scheduled_capture_at updated: %s -> %s", job_id, job['name'], current_next_capture_iso, next_capture_iso)
             if should_clear_warning:
-                logger.debug(f"Job {job_id} ({job['name']}) cleared warning message in {new_status} state")
+                logger.debug("Job %s (%s) cleared warning message in %s state", job_id, job['name'], new_status)
         
-        # Update in-memory queue with the value from database
-        db_next_capture = parse_iso(job['next_scheduled_capture_at']) if job.get('next_scheduled_capture_at') else None
+        # Completed jobs come off the schedule without another query; drop their failure streak too
+        if new_status not in ('active', 'sleeping'):
+            state = self.job_states.get(job_id)
+            if state is not None:
+                state.failures = 0
+            return update, None
         
-        if new_status == 'active' and db_next_capture:
-            self.scheduled_captures[job_id] = db_next_capture
-        else:
-            self.scheduled_captures.pop(job_id, None)
+        # A job that isn't about to be captured is only queued for a future time - a past one would be
+        # popped as due straight away, re-evaluated to the same time and queued again, in a busy loop.
+        # If the calculator ever yields one, the next full pass looks at the job again instead
+        if new_status != 'active' and next_capture is not None and next_capture <= now:
+            logger.debug("Job %s (%s) %s with a past next check %s - leaving it to the next full pass", job_id, job['name'], new_status, next_capture_iso)
+            return update, None
+        
+        # The in-memory queue takes the value now in the row (next_capture either matched it or replaced it)
+        return update, next_capture
+    
+    def _queue_next_checks(self, next_checks: List[Tuple[int, Optional[datetime]]]) -> None:
+        """
+        Queue a status pass's results under a single lock acquisition.
+        A job being captured is skipped - its worker re-queues it once the capture finishes.
+        """
+        with self._cond:
+            for job_id, next_capture in next_checks:
+                state = self.job_states.get(job_id)
+                if state is None or not state.in_progress:
+                    self._queue_next_check(job_id, next_capture)
     
     def _check_and_capture(self):
         """Check scheduled jobs and capture if it's time, using parallel execution"""
+        # One timestamp (and its ISO form) for every comparison and write in this tick
         now = get_now()
+        now_iso = to_iso(now)
         
-        # Get all jobs that might need processing
-        # Include jobs with pending captures even if past end_datetime
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM jobs
-                WHERE status IN ('active', 'sleeping')
-                AND datetime(start_datetime) <= datetime(?)
-                AND (
-                    end_datetime IS NULL 
-                    OR datetime(end_datetime) >= datetime(?)
-                    OR (
-                        next_scheduled_capture_at IS NOT NULL
-                        AND datetime(next_scheduled_capture_at) <= datetime(end_datetime)
-                    )
-                )
-            """, (to_iso(now), to_iso(now)))
-            
-            jobs = [dict_from_row(row) for row in cursor.fetchall()]
-        
-        logger.debug(f"Check at {to_iso(now)}: Found {len(jobs)} active/sleeping jobs")
+        with self._cond:
+            due_job_ids = self._due_job_ids
+            self._due_job_ids = set()
+            completed = self._completed_captures
+            self._completed_captures = []
         
-        # PHASE 1: Update job statuses (sleeping/active/completed)
-        for job in jobs:
-            self._update_job_status(job, now)
+        # Between full passes only jobs whose next capture (or start) has arrived can change
+        # state - the heap already knows which, so most ticks read just those rows by id
+        reconcile = time.monotonic() >= self._next_reconcile_at
+        if not reconcile and not due_job_ids and not completed:
+            return
         
-        # PHASE 2: Collect jobs ready for capture
-        jobs_to_capture = []
-        for job in jobs:
-            # Skip if not active after update
-            if job['status'] != 'active':
-                continue
+        with get_db() as conn:
+            # PHASE 0: Store the next schedule of every capture finished since the last tick - one
+            # writer for all of them, before the reads below so they see the new schedules
+            finished_checks = self._apply_completed_captures(conn, completed) if completed else []
             
-            job_id = job['id']
-            scheduled_time = self.scheduled_captures.get(job_id)
+            jobs = ()
+            if reconcile:
+                jobs = iter_dicts_from_cursor(conn.execute(SQL_SELECT_RECONCILE_JOBS, (now_iso, now_iso, now_iso)))
+            elif due_job_ids:
+                jobs = iter_dicts_from_cursor(conn.execute(SQL_SELECT_JOBS_BY_ID, (json.dumps(list(due_job_ids)),)))
             
-            # Check if capture time has arrived
-            if not scheduled_time or now < scheduled_time:
-                continue
+            # PHASE 1: One pass over the streamed rows - update statuses (sleeping/active/completed) and
+            # pick out the captures that are due; only those jobs' dicts outlive their iteration, and
+            # every write and queue change is applied after the loop
+            status_updates = []
+            next_checks = []
+            capture_candidates = []
+            skipped = False
+            evaluated = 0
+            now_in_window = {}
+            for job in jobs:
+                evaluated += 1
+                update, next_check = self._update_job_status(job, now, now_iso, now_in_window)
+                if update:
+                    status_updates.append(update)
+                
+                # Check if capture time has arrived for a job that is active after the update
+                if job['status'] == 'active' and next_check and now >= next_check:
+                    # Validate this capture should execute
+                    should_execute, reason = should_execute_capture(job, next_check, now)
+                    if should_execute:
+                        capture_candidates.append((job, next_check))
+                        continue
+                    logger.debug("Job %s (%s): Skipping capture - %s", job['id'], job['name'], reason)
+                    # Leave it to the next full pass rather than waking for it again right away
+                    next_check = None
+                    skipped = True
+                
+                next_checks.append((job['id'], next_check))
             
-            # Validate this capture should execute
-            should_execute, reason = should_execute_capture(job, scheduled_time, now)
-            if not should_execute:
-                logger.debug(f"Job {job_id} ({job['name']}): Skipping capture - {reason}")
-                continue
+            logger.debug("Check at %s: Evaluated %d jobs (%s)", now_iso, evaluated, 'full pass' if reconcile else 'due')
             
-            # Only capture if not already in progress
-            with self._lock:
-                if job_id not in self.captures_in_progress:
-                    jobs_to_capture.append(job)
-                    self.captures_in_progress.add(job_id)
-                    logger.debug(f"Job {job_id} ({job['name']}) ready for capture (scheduled: {to_iso(scheduled_time)})")
-                else:
-                    logger.info(f"Job {job_id} ({job['name']}): Skipped capture (already in progress)")
+            if reconcile:
+                # Variable-rate safety net: the queue already wakes the loop for every known capture,
+                # so while full passes keep finding nothing to do they run less and less often
+                with self._cond:
+                    if status_updates or capture_candidates or skipped:
+                        self._reconcile_interval = RECONCILE_INTERVAL_SECONDS
+                    else:
+                        self._reconcile_interval = min(self._reconcile_interval * 2, RECONCILE_INTERVAL_MAX_SECONDS)
+                    self._next_reconcile_at = time.monotonic() + self._reconcile_interval
+            
+            if status_updates:
+                conn.executemany(SQL_UPDATE_JOB_STATUS, status_updates)
+        
+        # Connection is back in the pool before any capture starts
+        
+        # PHASE 2: Release the finished captures and queue the pass's schedule, then claim the due
+        # jobs not already being captured (one critical section for all of them; logging happens after it)
+        if finished_checks:
+            self._finish_captures(finished_checks)
+        self._queue_next_checks(next_checks)
+        claimed = []
+        with self._cond:
+            for job, scheduled_time in capture_candidates:
+                state = self.job_states.get(job['id'])
+                if state is None:
+                    state = self.job_states[job['id']] = JobRuntimeState()
+                already_running = state.in_progress
+                if not already_running:
+                    state.in_progress = True
+                    # Dequeued until its worker finishes and queues the next capture
+                    self._queue_next_check(job['id'], None)
+                claimed.append(not already_running)
+        
+        # Debug lines are formatted lazily; this one also needs to_iso(), so it is checked once up front
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        jobs_to_capture = []
+        for (job, scheduled_time), is_claimed in zip(capture_candidates, claimed):
+            if is_claimed:
+                jobs_to_capture.append(job)
+                if debug_enabled:
+                    logger.debug("Job %s (%s) ready for capture (scheduled: %s)", job['id'], job['name'], to_iso(scheduled_time))
+            else:
+                logger.info(f"Job {job['id']} ({job['name']}): Skipped capture (already in progress)")
         
         # PHASE 3: Execute captures in parallel
         if jobs_to_capture:
             self._execute_captures_parallel(jobs_to_capture, now)
     
     def _execute_captures_parallel(self, jobs: list, capture_time: datetime):
-        """Execute multiple captures in parallel using ThreadPoolExecutor"""
-        logger.debug(f"Executing {len(jobs)} capture(s) in parallel")
-        
-        # Submit all capture tasks
-        future_to_job = {
-            self.executor.submit(self._execute_single_capture, job, capture_time): job
-            for job in jobs
-        }
-        
-        # Wait for all captures to complete
-        for future in as_completed(future_to_job):
-            job = future_to_job[future]
-            try:
-                future.result()  # This will raise any exceptions that occurred
-            except Exception as e:
-                logger.error(f"Capture task failed for job {job['id']}: {e}", exc_info=True)
+        """
+        Start captures in parallel using ThreadPoolExecutor without waiting for them.
+        Each worker reports its result when done and the next tick stores the job's next
+        schedule, so the tick never waits on the slowest camera.
+        """
+        logger.debug("Executing %d capture(s) in parallel", len(jobs))
+        
+        for job in jobs:
+            # Backpressure: with every slot taken (slow or unreachable cameras), leave the job due in
+            # the database and hold its id for the tick after the next finished capture
+            if not self._capture_slots.acquire(blocking=False):
+                logger.warning(f"Capture backpressure: all {config.CAPTURE_WORKERS * 2} capture slots busy, deferring job {job['id']} ({job['name']})")
+                with self._cond:
+                    state = self.job_states[job['id']]
+                    state.in_progress = False
+                    self._drop_idle_state(job['id'], state)
+                    self._due_job_ids.add(job['id'])
+                    self._captures_deferred = True
+                continue
+            
+            self._submit_capture(job, capture_time)
+    
+    def _submit_capture(self, job: dict, capture_time: datetime):
+        """
+        Hand a capture (which holds a capture slot) to the executor.
+        With MAX_CAPTURES_PER_HOST set, captures beyond the limit for one camera host wait in that
+        host's queue instead of occupying workers, so a busy host can't hold up the others.
+        """
+        host = None
+        if config.MAX_CAPTURES_PER_HOST > 0:
+            host = urlsplit(job['url']).hostname or job['url']
+            with self._cond:
+                active = self._host_active.get(host, 0)
+                if active >= config.MAX_CAPTURES_PER_HOST:
+                    self._host_waiting.setdefault(host, deque()).append((job, capture_time))
+                    logger.debug("Job %s (%s) waiting for camera host %s", job['id'], job['name'], host)
+                    return
+                self._host_active[host] = active + 1
+        
+        future = self.executor.submit(self._execute_single_capture, job, capture_time)
+        future.add_done_callback(partial(self._capture_task_done, job['id'], host))
+    
+    def _start_next_for_host(self, host: str):
+        """Start the next capture waiting for a camera host, or free the host's place"""
+        with self._cond:
+            waiting = self._host_waiting.get(host)
+            if not waiting or not self.running:
+                self._host_active[host] -= 1
+                if not self._host_active[host]:
+                    del self._host_active[host]
+                return
+            job, capture_time = waiting.popleft()
+            if not waiting:
+                del self._host_waiting[host]
+        
+        # The host's place passes straight to the waiting capture
+        future = self.executor.submit(self._execute_single_capture, job, capture_time)
+        future.add_done_callback(partial(self._capture_task_done, job['id'], host))
+    
+    def _capture_task_done(self, job_id: int, host: Optional[str], future):
+        """Free the task's capture slot and log errors that escaped its own handling (e.g. reporting its result)"""
+        self._capture_slots.release()
+        if host is not None:
+            self._start_next_for_host(host)
+        # Unlocked pre-check: a deferral is rare, so most completions don't touch the scheduler lock
+        if self._captures_deferred:
+            with self._cond:
+                if self._captures_deferred:
+                    self._captures_deferred = False
+                    self._wake_requested = True
+                    self._cond.notify()
+        
+        if not future.cancelled() and future.exception() is not None:
+            error = future.exception()
+            logger.error(f"Capture task failed for job {job_id}: {error}", exc_info=error)
     
     def _execute_single_capture(self, job: dict, capture_time: datetime):
-        """Execute a single capture and update the schedule"""
+        """Execute a single capture and hand its outcome to the scheduler thread"""
         job_id = job['id']
+        result = CaptureResult(job_id, capture_time)
+        # Claimed (in progress) entries are never dropped, so the state outlives this capture
+        state = self.job_states[job_id]
         
         try:
-            logger.debug(f"Attempting capture for job {job_id}: {job['name']}")
-            success, error_message = capture_image(job)
+            logger.debug("Attempting capture for job %s: %s", job_id, job['name'])
+            success, error_message, result.captured = capture_image_file(job)
             
             if success:
-                self.failure_counts[job_id] = 0  # Reset failure count on success
-                logger.debug(f"Successfully captured image for job {job_id}: {job['name']}")
+                state.failures = 0  # Reset failure count on success
+                logger.debug("Successfully captured image for job %s: %s", job_id, job['name'])
             else:
                 # Increment failure count
-                self.failure_counts[job_id] = self.failure_counts.get(job_id, 0) + 1
-                consecutive_failures = self.failure_counts[job_id]
+                state.failures += 1
+                consecutive_failures = state.failures
                 
                 logger.warning(f"Capture failed for job {job_id}: {job['name']} - {error_message} (failure {consecutive_failures}/3)")
                 
-                # Only set warning message after 3 consecutive failures
+                # Only set warning message after 3 consecutive failures,
+                # otherwise clear a warning that exists but hasn't hit the threshold yet
+                result.update_warning = True
                 if consecutive_failures >= 3:
-                    with get_db() as conn:
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            "UPDATE jobs SET warning_message = ? WHERE id = ?",
-                            (f"{error_message} (after {consecutive_failures} consecutive failures)", job_id)
-                        )
-                else:
-                    # Clear warning if it exists but we haven't hit threshold yet
-                    with get_db() as conn:
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            "UPDATE jobs SET warning_message = NULL WHERE id = ?",
-                            (job_id,)
-                        )
+                    result.warning_message = f"{error_message} (after {consecutive_failures} consecutive failures)"
         except Exception as e:
             logger.error(f"Failed to capture for job {job_id}: {e}", exc_info=True)
             
             # Increment failure count for exceptions too
-            self.failure_counts[job_id] = self.failure_counts.get(job_id, 0) + 1
-            consecutive_failures = self.failure_counts[job_id]
+            state.failures += 1
+            consecutive_failures = state.failures
             
             # Only set warning message after 3 consecutive failures
             if consecutive_failures >= 3:
-                with get_db() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "UPDATE jobs SET warning_message = ? WHERE id = ?",
-                        (f"Exception during capture: {str(e)} (after {consecutive_failures} consecutive failures)", job_id)
-                    )
+                result.update_warning = True
+                result.warning_message = f"Exception during capture: {str(e)} (after {consecutive_failures} consecutive failures)"
         finally:
-            # Calculate next capture using context-aware calculator
-            with get_db() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
-                row = cursor.fetchone()
-                if row:
-                    job = dict_from_row(row)
-                    
-                    # Calculate next state (no pending capture now - we just captured)
-                    new_status, next_capture, reason = calculate_job_state(job, capture_time, pending_capture_time=None)
-                    
-                    # Update database
-                    cursor.execute(
-                        "UPDATE jobs SET status = ?, next_scheduled_capture_at = ?, updated_at = ? WHERE id = ?",
-                        (new_status, to_iso(next_capture) if next_capture else None, to_iso(capture_time), job_id)
-                    )
-                    
-                    # Update in-memory queue
-                    if new_status == 'active' and next_capture:
-                        self.scheduled_captures[job_id] = next_capture
-                        logger.debug(f"Job {job_id} next capture at {to_iso(next_capture)}")
-                    else:
-                        self.scheduled_captures.pop(job_id, None)
-                        logger.info(f"Job {job_id} status: {new_status}")
+            # The scheduler thread writes the next schedule - workers never contend for the write lock.
+            # The job stays in progress until then, so the loop can't capture it again meanwhile.
+            with self._cond:
+                self._completed_captures.append(result)
+                self._wake_requested = True
+                self._cond.notify()
+    
+    def _apply_completed_captures(self, conn, completed: List[CaptureResult]) -> List[Tuple[int, Optional[datetime]]]:
+        """
+        Record finished captures and store their next schedule in one batch (one transaction per tick).
+        Rows are read fresh, so edits made through the API during a capture are respected
+        and deleted jobs drop out. Returns the (job_id, next check) pairs for _finish_captures().
+        """
+        cursor = conn.execute(SQL_SELECT_CAPTURED_JOBS, (json.dumps([result.job_id for result in completed]),))
+        jobs = {job['id']: job for job in dicts_from_cursor(cursor)}
+        
+        captures = []
+        updates = []
+        warning_updates = []
+        next_checks = []
+        for result in completed:
+            job_id = result.job_id
+            job = jobs.get(job_id)
+            next_check = None
             
-            # Remove from in-progress set
-            with self._lock:
-                self.captures_in_progress.discard(job_id)
+            if job:
+                if result.captured:
+                    captures.append((job_id, *result.captured))
+                
+                # Calculate next state (no pending capture now - we just captured)
+                new_status, next_capture, reason = calculate_job_state(job, result.capture_time, pending_capture_time=None)
+                next_capture_iso = to_iso(next_capture) if next_capture else None
+                capture_time_iso = to_iso(result.capture_time)
+                
+                # The row's warning is already known - skip writing it when it wouldn't change
+                # (e.g. clearing a warning that is already NULL on every sub-threshold failure)
+                if result.update_warning and job.get('warning_message') != result.warning_message:
+                    warning_updates.append((new_status, next_capture_iso, capture_time_iso, result.warning_message, job_id))
+                else:
+                    updates.append((new_status, next_capture_iso, capture_time_iso, job_id))
+                
+                if new_status in ('active', 'sleeping'):
+                    next_check = next_capture
+                
+                if new_status == 'active' and next_capture:
+                    logger.debug("Job %s next capture at %s", job_id, next_capture_iso)
+                else:
+                    logger.info(f"Job {job_id} status: {new_status}")
+            
+            # Finished (or deleted) jobs won't capture again - forget their failure streak
+            if next_check is None:
+                self.job_states[job_id].failures = 0
+            next_checks.append((job_id, next_check))
+        
+        # Statistics first, so the schedule write leaves updated_at at the capture time as before
+        if captures:
+            record_captures(conn, captures)
+        if updates:
+            conn.executemany(SQL_UPDATE_CAPTURED_JOB, updates)
+        if warning_updates:
+            conn.executemany(SQL_UPDATE_CAPTURED_JOB_WARNING, warning_updates)
+        
+        return next_checks
+    
+    def _finish_captures(self, next_checks: List[Tuple[int, Optional[datetime]]]) -> None:
+        """Take finished captures out of progress and queue their next capture (the loop skipped them while they ran)"""
+        with self._cond:
+            for job_id, next_capture in next_checks:
+                self.job_states[job_id].in_progress = False
+                self._queue_next_check(job_id, next_capture)
 
 
 # Singleton instance
@@ -6,9 +6,15 @@ from datetime import datetime, timedelta, time
 import logging
 
 from ..models import DurationEstimate, DurationCalculation
+from ..utils import parse_iso
+from .job_state import parse_time_string
 
 logger = logging.getLogger(__name__)
 
+US_PER_SECOND = 1_000_000
+US_PER_DAY = 86400 * US_PER_SECOND
+ONE_MICROSECOND = timedelta(microseconds=1)
+
 
 def calculate_captures_in_time_range(
     start: datetime,
@@ -38,20 +44,8 @@ def calculate_captures_in_time_range(
         duration_seconds = (end - start).total_seconds()
         return int(duration_seconds / interval_seconds)
     
-    # Parse time window
-    def parse_time(time_str: str) -> time:
-        hours, minutes = map(int, time_str.split(':'))
-        return time(hour=hours, minute=minutes)
-    
-    # Helper to create timezone-aware datetime
-    def make_aware(dt: datetime, reference: datetime) -> datetime:
-        """Make a naive datetime aware using the timezone from reference datetime"""
-        if dt.tzinfo is None and reference.tzinfo is not None:
-            return dt.replace(tzinfo=reference.tzinfo)
-        return dt
-    
-    window_start = parse_time(time_window_start)
-    window_end = parse_time(time_window_end)
+    window_start = parse_time_string(time_window_start)
+    window_end = parse_time_string(time_window_end)
     
     # Determine if window spans midnight
     window_spans_midnight = window_start >= window_end
@@ -59,69 +53,51 @@ def calculate_captures_in_time_range(
     logger.debug(f"Calculating captures: start={start}, end={end}, interval={interval_seconds}s")
     logger.debug(f"Time window: {time_window_start}-{time_window_end} (spans_midnight={window_spans_midnight})")
     
-    # Calculate captures by iterating through each window period
-    total_captures = 0
-    current = start
+    # Closed form instead of walking the range window by window. Work in microseconds since
+    # midnight of the start date (in start's timezone, as the windows are): day k's window
+    # opens at k * DAY + open_us and is window_us long (a midnight-spanning one ends the next day)
+    midnight = datetime.combine(start.date(), time(0, 0), tzinfo=start.tzinfo)
+    open_us = (window_start.hour * 3600 + window_start.minute * 60) * US_PER_SECOND
+    window_us = (window_end.hour * 3600 + window_end.minute * 60) * US_PER_SECOND - open_us
+    if window_spans_midnight:
+        window_us += US_PER_DAY
+    start_us = (start - midnight) // ONE_MICROSECOND
+    end_us = (end - midnight) // ONE_MICROSECOND
     
-    # Safety limit to prevent infinite loops
-    max_iterations = 10000
-    iterations = 0
-    
-    while current < end and iterations < max_iterations:
-        iterations += 1
-        current_date = current.date()
-        current_time = current.time()
-        
-        # Determine this window's start and end times
-        if window_spans_midnight:
-            # Window spans midnight (e.g., 22:00 to 02:00)
-            if current_time < window_end:
-                # We're in the early morning part (before window_end)
-                # This window started yesterday
-                day_window_start = make_aware(datetime.combine(current_date - timedelta(days=1), window_start), start)
-                day_window_end = make_aware(datetime.combine(current_date, window_end), start)
-            else:
-                # We're after the early morning part
-                # Next window starts today at window_start and ends tomorrow at window_end
-                day_window_start = make_aware(datetime.combine(current_date, window_start), start)
-                day_window_end = make_aware(datetime.combine(current_date + timedelta(days=1), window_end), start)
-        else:
-            # Normal window (e.g., 08:00 to 20:00)
-            day_window_start = make_aware(datetime.combine(current_date, window_start), start)
-            day_window_end = make_aware(datetime.combine(current_date, window_end), start)
-        
-        # Ensure we're not looking at a window in the past
-        if day_window_end <= current:
-            # This window has already passed, move to next day
-            current = make_aware(datetime.combine(current_date + timedelta(days=1), time(0, 0)), start)
-            continue
-        
-        # Find the actual capture period for this window (intersection with our time range)
-        capture_start = max(current, day_window_start)
-        capture_end = min(end, day_window_end)
-        
-        logger.debug(f"Iteration {iterations}: day_window={day_window_start.time()}-{day_window_end.time()}, capture_start={capture_start}, capture_end={capture_end}")
-        
-        if capture_start < capture_end:
-            # There's a valid capture period in this window
-            window_duration = (capture_end - capture_start).total_seconds()
-            window_captures = int(window_duration / interval_seconds)
-            total_captures += window_captures
-            
-            # Move to the end of this window to look for the next one
-            current = day_window_end
-        else:
-            # No overlap with this window, move forward
-            if day_window_start >= end:
-                # Next window is beyond our end time, we're done
-                break
-            # Move to the start of this window
-            current = day_window_start
+    total_captures = _count_window_captures(start_us, end_us, interval_seconds, open_us, window_us)
     
     logger.debug(f"Total captures calculated: {total_captures}")
     return total_captures
 
 
+def _count_window_captures(start_us: int, end_us: int, interval_seconds: int, open_us: int, window_us: int) -> int:
+    """
+    Integer core of calculate_captures_in_time_range(): captures in the daily windows
+    (opening open_us after midnight, window_us long) that overlap [start_us, end_us].
+    No datetime objects and no per-call closures - just a handful of int operations.
+    """
+    # First window still open after start, last window opening before end
+    first_day = (start_us - open_us - window_us) // US_PER_DAY + 1
+    last_day = -((open_us - end_us) // US_PER_DAY) - 1
+    if first_day > last_day:
+        return 0
+    
+    # The first and last windows may be clipped; every window between them is complete.
+    # Overlaps are divided as total_seconds() would (microseconds / 1e6, then / interval)
+    first_open = first_day * US_PER_DAY + open_us
+    overlap_us = min(end_us, first_open + window_us) - max(start_us, first_open)
+    total_captures = int(overlap_us / US_PER_SECOND / interval_seconds) if overlap_us > 0 else 0
+    
+    if last_day > first_day:
+        last_open = last_day * US_PER_DAY + open_us
+        overlap_us = min(end_us, last_open + window_us) - last_open
+        if overlap_us > 0:
+            total_captures += int(overlap_us / US_PER_SECOND / interval_seconds)
+        total_captures += (last_day - first_day - 1) * int(window_us / US_PER_SECOND / interval_seconds)
+    
+    return total_captures
+
+
 def calculate_duration(
     job: Dict[str, Any],
     hours: Optional[float] = None,
@@ -143,10 +119,10 @@ def calculate_duration(
     time_window_enabled = job.get('time_window_enabled', False)
     
     # Determine number of captures
+    start = parse_iso(job['start_datetime'])
     if job['end_datetime']:
         # Job has defined end time
-        start = datetime.fromisoformat(job['start_datetime'])
-        end = datetime.fromisoformat(job['end_datetime'])
+        end = parse_iso(job['end_datetime'])
         
         total_captures = calculate_captures_in_time_range(
             start, end, interval_seconds,
@@ -164,7 +140,6 @@ def calculate_duration(
             # Default estimates: 1 hour, 1 day, 1 week, 1 month
             estimate_seconds = 3600  # 1 hour default
         
-        start = datetime.fromisoformat(job['start_datetime'])
         end = start + timedelta(seconds=estimate_seconds)
         
         total_captures = calculate_captures_in_time_range(
@@ -3,20 +3,79 @@ Image capture service - handles capturing images from HTTP and RTSP streams
 """
 import subprocess
 import os
-from typing import Dict, Any, Optional
+import base64
+import http.client
+import socket
+import ssl
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, urlunsplit, unquote
 import logging
 
 from ..database import get_db
 from .. import config
 from ..utils import get_now, to_iso
-from .thumbnail_generator import generate_thumbnail
+from .thumbnail_generator import queue_thumbnail
 
 logger = logging.getLogger(__name__)
 
+# Snapshot URLs that answered with something other than a single JPEG (e.g. an MJPEG stream),
+# with when to request them directly again; until then they go straight to ffmpeg instead of
+# being requested twice per capture. Entries expire so one error page doesn't disable the fast path for good
+_ffmpeg_only_until: Dict[str, float] = {}
+FFMPEG_ONLY_RETRY_SECONDS = 3600
+
+# Snapshot requests carry the camera's credentials, so certificates are verified unless
+# SNAPSHOT_VERIFY_TLS is turned off for cameras with self-signed ones
+_snapshot_ssl_context = ssl.create_default_context()
+if not config.SNAPSHOT_VERIFY_TLS:
+    _snapshot_ssl_context.check_hostname = False
+    _snapshot_ssl_context.verify_mode = ssl.CERT_NONE
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Refuse redirects - urllib would resend the Authorization header to wherever they point"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+# A redirect surfaces as an HTTPError, so the capture falls back to ffmpeg
+_snapshot_opener = urllib.request.build_opener(
+    _NoRedirectHandler,
+    urllib.request.HTTPSHandler(context=_snapshot_ssl_context)
+)
+
+SNAPSHOT_CHUNK_SIZE = 64 * 1024
+
+# Last hour directory created per job - a new one is only needed when the hour changes
+_last_dir_by_job_id: Dict[int, str] = {}
+
+
+# Fallback for job dicts that don't carry capture_count
+SQL_SELECT_CAPTURE_COUNT = "SELECT capture_count FROM jobs WHERE id = ?"
+
+# Capture bookkeeping, written for many captures at once by record_captures()
+SQL_INSERT_CAPTURE = """
+    INSERT INTO captures (job_id, file_path, file_size, captured_at)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Update job statistics and clear warning message
+SQL_UPDATE_JOB_CAPTURE_STATS = """
+    UPDATE jobs
+    SET capture_count = capture_count + 1,
+        storage_size = storage_size + ?,
+        updated_at = ?,
+        warning_message = NULL
+    WHERE id = ?
+"""
+
 
 def capture_image(job: Dict[str, Any]) -> tuple[bool, Optional[str]]:
     """
-    Capture an image from a video stream
+    Capture an image from a video stream and record it in the database
     
     Args:
         job: Job dictionary with capture configuration
@@ -24,12 +83,36 @@ def capture_image(job: Dict[str, Any]) -> tuple[bool, Optional[str]]:
     Returns:
         tuple: (success: bool, error_message: Optional[str])
     """
+    success, error_msg, captured = capture_image_file(job)
+    if captured:
+        try:
+            with get_db() as conn:
+                record_captures(conn, [(job['id'], *captured)])
+        except Exception as e:
+            logger.error(f"Error recording capture for job {job['id']}: {e}")
+            return False, f"Exception: {str(e)}"
+    return success, error_msg
+
+
+def capture_image_file(job: Dict[str, Any]) -> tuple[bool, Optional[str], Optional[tuple[str, int, str]]]:
+    """
+    Capture an image from a video stream without recording it, so the caller can
+    write it along with other captures (the scheduler does one transaction per tick)
+    
+    Args:
+        job: Job dictionary with capture configuration
+        
+    Returns:
+        tuple: (success: bool, error_message: Optional[str],
+                (file_path, file_size, captured_at) of the new image, or None)
+    """
     try:
-        # Get current capture count
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT capture_count FROM jobs WHERE id = ?", (job['id'],))
-            capture_count = cursor.fetchone()[0]
+        # Get current capture count - the scheduler hands over the full row it read this tick,
+        # so only a job dict without it costs a connection checkout and a query
+        capture_count = job.get('capture_count')
+        if capture_count is None:
+            with get_db() as conn:
+                capture_count = conn.execute(SQL_SELECT_CAPTURE_COUNT, (job['id'],)).fetchone()[0]
         
         # Generate filename and hierarchical path structure
         now = get_now()
@@ -56,8 +139,10 @@ def capture_image(job: Dict[str, Any]) -> tuple[bool, Optional[str]]:
         )
         output_path = os.path.join(date_path, filename)
         
-        # Ensure directory exists
-        os.makedirs(date_path, exist_ok=True)
+        # Ensure directory exists (once per job and hour)
+        if _last_dir_by_job_id.get(job['id']) != date_path:
+            os.makedirs(date_path, exist_ok=True)
+            _last_dir_by_job_id[job['id']] = date_path
         
         # Capture based on stream type
         if job['stream_type'] == 'rtsp':
@@ -65,40 +150,44 @@ def capture_image(job: Dict[str, Any]) -> tuple[bool, Optional[str]]:
         else:  # http
             success, error_msg = _capture_http(job['url'], output_path)
         
-        if success and os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            
-            # Generate thumbnail for the captured image
-            generate_thumbnail(output_path)
-            
-            # Record capture in database
-            with get_db() as conn:
-                cursor = conn.cursor()
-                
-                # Insert capture record
-                cursor.execute("""
-                    INSERT INTO captures (job_id, file_path, file_size, captured_at)
-                    VALUES (?, ?, ?, ?)
-                """, (job['id'], output_path, file_size, to_iso(get_now())))
-                
-                # Update job statistics and clear warning message
-                cursor.execute("""
-                    UPDATE jobs
-                    SET capture_count = capture_count + 1,
-                        storage_size = storage_size + ?,
-                        updated_at = ?,
-                        warning_message = NULL
-                    WHERE id = ?
-                """, (file_size, to_iso(get_now()), job['id']))
+        if success:
+            # One stat answers both "was the image written" and "how big is it"
+            try:
+                file_size = os.stat(output_path).st_size
+            except FileNotFoundError:
+                success = False
+        
+        if success:
+            # Thumbnail the captured image in the background - the worker is free for the next capture
+            queue_thumbnail(output_path)
             
             logger.info(f"Captured image for job '{job['name']}' (ID: {job['id']}): {filename}")
-            return True, None
+            # One completion timestamp for both the capture row and the job's updated_at
+            return True, None, (output_path, file_size, to_iso(get_now()))
         
-        return False, error_msg or "Unknown capture error"
+        # The directory may have been removed under us - check it again next time
+        _last_dir_by_job_id.pop(job['id'], None)
+        return False, error_msg or "Unknown capture error", None
         
     except Exception as e:
         logger.error(f"Error capturing image for job {job['id']}: {e}")
-        return False, f"Exception: {str(e)}"
+        _last_dir_by_job_id.pop(job['id'], None)
+        return False, f"Exception: {str(e)}", None
+
+
+def record_captures(conn, captures: List[tuple[int, str, int, str]]) -> None:
+    """
+    Record captured images and bump their jobs' statistics on the caller's connection.
+    
+    Args:
+        conn: Open connection; the caller's get_db() block is the transaction
+        captures: (job_id, file_path, file_size, captured_at) per image
+    """
+    conn.executemany(SQL_INSERT_CAPTURE, captures)
+    conn.executemany(
+        SQL_UPDATE_JOB_CAPTURE_STATS,
+        [(file_size, captured_at, job_id) for job_id, _, file_size, captured_at in captures]
+    )
 
 
 def _capture_rtsp(url: str, output_path: str) -> tuple[bool, Optional[str]]:
@@ -106,6 +195,7 @@ def _capture_rtsp(url: str, output_path: str) -> tuple[bool, Optional[str]]:
     try:
         cmd = [
             'ffmpeg',
+            '-nostdin',
             '-loglevel', 'error',
             '-rtsp_transport', 'tcp',
             '-i', url,
@@ -115,9 +205,13 @@ def _capture_rtsp(url: str, output_path: str) -> tuple[bool, Optional[str]]:
             output_path
         ]
         
+        # Only stderr is read; stdin/stdout are detached so many concurrent captures
+        # don't each hold an extra pipe (and ffmpeg never waits on the server's stdin)
         result = subprocess.run(
             cmd,
-            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             timeout=config.FFMPEG_TIMEOUT,
             check=False
         )
@@ -137,11 +231,85 @@ def _capture_rtsp(url: str, output_path: str) -> tuple[bool, Optional[str]]:
         return False, f"RTSP Error: {str(e)}"
 
 
+def _is_timeout(error: Exception) -> bool:
+    """Whether a urllib error is a connect or read timeout (URLError wraps the former)"""
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason
+    return isinstance(error, socket.timeout)
+
+
+def _fetch_jpeg_snapshot(url: str, output_path: str) -> Optional[tuple[bool, Optional[str]]]:
+    """
+    Save an HTTP snapshot as served when the camera returns a single JPEG - no ffmpeg process.
+    Returns the capture result, or None, with nothing written, when ffmpeg should try instead:
+    another content type (streams, other formats) or an HTTP/auth/protocol error it may handle.
+    A camera that times out or can't be reached fails here - ffmpeg would only wait for it again,
+    as does one whose certificate doesn't verify. The whole fetch is bounded by FFMPEG_TIMEOUT,
+    like the ffmpeg process, not just each socket operation.
+    """
+    parts = urlsplit(url)
+    request_url = url
+    headers = {}
+    if parts.username is not None:
+        # Credentials in the URL become a Basic auth header, as ffmpeg sends them
+        credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+        headers['Authorization'] = 'Basic ' + base64.b64encode(credentials.encode()).decode('ascii')
+        request_url = urlunsplit(parts._replace(netloc=parts.netloc.rpartition('@')[2]))
+    
+    deadline = time.monotonic() + config.FFMPEG_TIMEOUT
+    try:
+        request = urllib.request.Request(request_url, headers=headers)
+        with _snapshot_opener.open(request, timeout=config.FFMPEG_TIMEOUT) as response:
+            if response.headers.get_content_type() != 'image/jpeg':
+                _ffmpeg_only_until[url] = time.monotonic() + FFMPEG_ONLY_RETRY_SECONDS
+                return None
+            try:
+                with open(output_path, 'wb') as f:
+                    # read1() returns what has arrived, so a camera trickling bytes still meets the deadline
+                    while chunk := response.read1(SNAPSHOT_CHUNK_SIZE):
+                        f.write(chunk)
+                        if time.monotonic() > deadline:
+                            raise socket.timeout(f"snapshot not received within {config.FFMPEG_TIMEOUT}s")
+            except (OSError, http.client.HTTPException):
+                # Don't leave a truncated image behind for the ffmpeg retry to report on
+                if os.path.exists(output_path):
+                    os.unlink(output_path)
+                raise
+        _ffmpeg_only_until.pop(url, None)
+        return True, None
+    except urllib.error.HTTPError as e:
+        # The camera answered - with a status ffmpeg may get past (e.g. Digest auth)
+        logger.debug(f"Direct snapshot fetch failed, falling back to ffmpeg: {e}")
+        return None
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        if _is_timeout(e):
+            logger.error(f"HTTP capture timed out: {url}")
+            return False, "HTTP Error: Connection timeout"
+        if isinstance(e, urllib.error.URLError) and isinstance(e.reason, ssl.SSLCertVerificationError):
+            # Not handed to ffmpeg, which would send the credentials without verifying
+            logger.error(f"HTTP capture failed: {e.reason}")
+            return False, "HTTP Error: Certificate verification failed (SNAPSHOT_VERIFY_TLS=false allows self-signed cameras)"
+        if (isinstance(e, urllib.error.URLError) and isinstance(e.reason, OSError)
+                and not isinstance(e.reason, ssl.SSLError)):
+            # Refused, unresolvable or unreachable - ffmpeg wouldn't get through either
+            logger.error(f"HTTP capture failed: {e.reason}")
+            return False, "HTTP Error: Stream unreachable or invalid"
+        logger.debug(f"Direct snapshot fetch failed, falling back to ffmpeg: {e}")
+        return None
+
+
 def _capture_http(url: str, output_path: str) -> tuple[bool, Optional[str]]:
-    """Capture from HTTP stream using FFMPEG"""
+    """Capture from HTTP snapshot (saved directly when it is a JPEG) or stream using FFMPEG"""
+    retry_at = _ffmpeg_only_until.get(url)
+    if retry_at is None or time.monotonic() >= retry_at:
+        result = _fetch_jpeg_snapshot(url, output_path)
+        if result is not None:
+            return result
+    
     try:
         cmd = [
             'ffmpeg',
+            '-nostdin',
             '-loglevel', 'error',
             '-i', url,
             '-frames:v', '1',
@@ -150,9 +318,13 @@ def _capture_http(url: str, output_path: str) -> tuple[bool, Optional[str]]:
             output_path
         ]
         
+        # Only stderr is read; stdin/stdout are detached so many concurrent captures
+        # don't each hold an extra pipe (and ffmpeg never waits on the server's stdin)
         result = subprocess.run(
             cmd,
-            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             timeout=config.FFMPEG_TIMEOUT,
             check=False
         )
@@ -2,8 +2,10 @@
 Context-aware job state calculator - single source of truth
 Replaces the circular dependencies between time_window.py, state_manager.py, and scheduler
 """
-from typing import Optional, Tuple, Literal
-from datetime import datetime, timedelta, time
+from typing import Callable, Optional, Tuple, Literal
+from dataclasses import dataclass
+from datetime import datetime, timedelta, time, tzinfo
+from functools import lru_cache
 import logging
 
 from ..utils import get_now, to_iso, parse_iso, ensure_timezone_aware
@@ -13,36 +15,120 @@ logger = logging.getLogger(__name__)
 JobStatus = Literal['active', 'sleeping', 'completed', 'disabled']
 
 
-def calculate_next_capture_on_grid(job: dict, reference_time: datetime) -> Optional[datetime]:
+class StateReason:
+    """
+    Human-readable explanation of a calculated state, formatted only when rendered.
+    Most evaluations on a scheduler pass never log or return theirs, so they skip to_iso().
     """
-    Calculate next capture time on the schedule grid (start + N * interval).
-    Returns None if past end_datetime or before start.
+    __slots__ = ('template', 'at')
     
-    This is the pure mathematical calculation without time window logic.
+    def __init__(self, template: str, at: Optional[datetime] = None):
+        self.template = template
+        self.at = at
+    
+    def __str__(self) -> str:
+        return self.template.format(to_iso(self.at)) if self.at is not None else self.template
+    
+    def __repr__(self) -> str:
+        return f"StateReason({str(self)!r})"
+
+
+@dataclass(frozen=True, slots=True)
+class JobSchedule:
+    """A job's schedule fields, parsed once and shared by every evaluation of that schedule"""
+    start: datetime
+    end: Optional[datetime]
+    interval: int
+    in_window: Optional[Callable[[time], bool]]  # None when the job has no time window
+    window: Optional[Tuple[time, time]]  # Parsed (start, end) of the time window, if any
+    next_slot: Callable[[datetime], Optional[datetime]]  # calculate_next_capture_on_grid() specialized for this grid
+
+
+def job_schedule(job: dict) -> JobSchedule:
     """
-    start_dt = parse_iso(job['start_datetime'])
-    end_dt = parse_iso(job['end_datetime']) if job.get('end_datetime') else None
-    interval = job['interval_seconds']
+    The parsed schedule of a job row - one cache lookup per evaluation, after which
+    the bounds, interval and window check are plain attribute reads
+    """
+    if job.get('time_window_enabled'):
+        return _parse_schedule(
+            job['start_datetime'], job.get('end_datetime'), job['interval_seconds'],
+            job['time_window_start'], job['time_window_end']
+        )
+    return _parse_schedule(job['start_datetime'], job.get('end_datetime'), job['interval_seconds'], None, None)
+
+
+@lru_cache(maxsize=1024)
+def _parse_schedule(
+    start_str: str,
+    end_str: Optional[str],
+    interval_seconds: int,
+    window_start: Optional[str],
+    window_end: Optional[str]
+) -> JobSchedule:
+    """Build the JobSchedule for one set of schedule fields (cached - jobs are re-evaluated every pass)"""
+    start_dt = parse_iso(start_str)
+    end_dt = parse_iso(end_str) if end_str else None
     
-    # Before start
-    if reference_time < start_dt:
-        return start_dt
+    # A bounded grid is a fixed arithmetic sequence - count its slots once. Slot offsets are
+    # whole seconds, so N * interval > (end - start) exactly when it exceeds the whole seconds of it
+    slot_count = None
+    if end_dt:
+        span = end_dt - start_dt
+        slot_count = (span.days * 86400 + span.seconds) // interval_seconds + 1
     
-    # Calculate next slot on grid
-    elapsed = (reference_time - start_dt).total_seconds()
-    intervals_passed = int(elapsed / interval)
-    next_capture = start_dt + timedelta(seconds=(intervals_passed + 1) * interval)
+    window = (parse_time_string(window_start), parse_time_string(window_end)) if window_start is not None else None
     
-    # Keep advancing until we find a future time
-    while next_capture <= reference_time:
-        intervals_passed += 1
-        next_capture = start_dt + timedelta(seconds=(intervals_passed + 1) * interval)
+    return JobSchedule(
+        start=start_dt,
+        end=end_dt,
+        interval=interval_seconds,
+        in_window=minutes_window_predicate(minutes_of_day(window[0]), minutes_of_day(window[1])) if window else None,
+        window=window,
+        next_slot=_grid_stepper(start_dt, interval_seconds, slot_count)
+    )
+
+
+def calculate_next_capture_on_grid(job: dict, reference_time: datetime) -> Optional[datetime]:
+    """
+    Calculate next capture time on the schedule grid (start + N * interval): the first slot
+    after reference_time, found by one integer division. Returns start_datetime before the
+    job starts, and None once the next slot would be past end_datetime.
     
-    # Check if past end
-    if end_dt and next_capture > end_dt:
-        return None
+    This is the pure mathematical calculation without time window logic.
+    """
+    return job_schedule(job).next_slot(reference_time)
+
+
+def _grid_stepper(start_dt: datetime, interval: int, slot_count: Optional[int]) -> Callable[[datetime], Optional[datetime]]:
+    """
+    Build the next-slot calculation for one grid, with its start, interval and end baked in.
+    Built once per schedule, so an evaluation is a single call with no lookups or end-bound branch.
+    
+    Slots are computed in integer seconds - intervals are whole seconds, so the sub-second
+    remainder never crosses a slot, and there is no float rounding in total_seconds().
+    Closed form: (intervals_passed + 1) * interval > whole elapsed seconds, so the slot is always
+    in the future - however many intervals were missed, no stepping loop is needed.
+    """
+    if slot_count is None:
+        def next_slot(reference_time: datetime) -> Optional[datetime]:
+            # Before start
+            if reference_time < start_dt:
+                return start_dt
+            elapsed = reference_time - start_dt
+            return start_dt + timedelta(seconds=((elapsed.days * 86400 + elapsed.seconds) // interval + 1) * interval)
+    else:
+        def next_slot(reference_time: datetime) -> Optional[datetime]:
+            # Before start
+            if reference_time < start_dt:
+                return start_dt
+            elapsed = reference_time - start_dt
+            slot = (elapsed.days * 86400 + elapsed.seconds) // interval + 1
+            # Past end - an index compare against the grid's slot count, no datetime built
+            if slot >= slot_count:
+                return None
+            return start_dt + timedelta(seconds=slot * interval)
     
-    return next_capture
+    return next_slot
 
 
 def is_time_in_window(check_time: time, start_time: time, end_time: time) -> bool:
@@ -50,9 +136,10 @@ def is_time_in_window(check_time: time, start_time: time, end_time: time) -> boo
     Check if a time (hour:minute) is within a time window.
     Ignores seconds - compares only hour and minute.
     """
-    current_hm = time(check_time.hour, check_time.minute)
-    start_hm = time(start_time.hour, start_time.minute)
-    end_hm = time(end_time.hour, end_time.minute)
+    # Minutes since midnight - plain int compares instead of building three time objects per call
+    current_hm = check_time.hour * 60 + check_time.minute
+    start_hm = start_time.hour * 60 + start_time.minute
+    end_hm = end_time.hour * 60 + end_time.minute
     
     if start_hm == end_hm:
         # Same minute window (e.g., 10:02-10:02)
@@ -65,12 +152,41 @@ def is_time_in_window(check_time: time, start_time: time, end_time: time) -> boo
         return current_hm >= start_hm or current_hm <= end_hm
 
 
+@lru_cache(maxsize=256)
 def parse_time_string(time_str: str) -> time:
-    """Parse HH:MM time string to time object"""
+    """Parse HH:MM time string to time object (cached - jobs share a handful of window bounds)"""
     parts = time_str.split(':')
     return time(int(parts[0]), int(parts[1]))
 
 
+def minutes_of_day(t: time) -> int:
+    """Minutes since midnight of a time (seconds ignored, as window checks do)"""
+    return t.hour * 60 + t.minute
+
+
+@lru_cache(maxsize=256)
+def minutes_window_predicate(start_hm: int, end_hm: int) -> Callable[[time], bool]:
+    """
+    Build is_time_in_window() for window bounds given as minutes of day (cached per window).
+    The window shape is picked once, so each check is a single int comparison chain.
+    """
+    if start_hm == end_hm:
+        # Same minute window (e.g., 10:02-10:02)
+        def in_window(check_time: time) -> bool:
+            return check_time.hour * 60 + check_time.minute == start_hm
+    elif start_hm < end_hm:
+        # Normal window (doesn't cross midnight)
+        def in_window(check_time: time) -> bool:
+            return start_hm <= check_time.hour * 60 + check_time.minute <= end_hm
+    else:
+        # Window crosses midnight
+        def in_window(check_time: time) -> bool:
+            current_hm = check_time.hour * 60 + check_time.minute
+            return current_hm >= start_hm or current_hm <= end_hm
+    
+    return in_window
+
+
 def calculate_next_window_start(reference_time: datetime, start_time: time, end_time: time) -> datetime:
     """Calculate when the time window will next open"""
     current_time = reference_time.time()
@@ -81,25 +197,22 @@ def calculate_next_window_start(reference_time: datetime, start_time: time, end_
     if reference_time.tzinfo:
         today_start = today_start.replace(tzinfo=reference_time.tzinfo)
     
-    if is_time_in_window(current_time, start_time, end_time):
-        # In window now, next start is tomorrow
-        return today_start + timedelta(days=1)
-    
-    if start_time < end_time:
-        # Normal window
-        if current_time < start_time:
-            return today_start
-        else:
-            return today_start + timedelta(days=1)
-    else:
-        # Crosses midnight
-        if current_time >= start_time:
-            return today_start
-        else:
-            return today_start - timedelta(days=1)
+    # The next opening is never in the past: today's until it has passed, then tomorrow's.
+    # That holds for windows crossing midnight too - in the daytime gap, and after midnight
+    # inside the window that opened yesterday, the next opening is still today's
+    if current_time < start_time:
+        return today_start
+    return today_start + timedelta(days=1)
 
 
-def find_next_capture_in_window(job: dict, window_start: datetime, start_time: time, end_time: time, max_days: int = 30) -> Optional[datetime]:
+def find_next_capture_in_window(
+    job: dict,
+    window_start: datetime,
+    start_time: time,
+    end_time: time,
+    max_days: int = 30,
+    not_before: Optional[datetime] = None
+) -> Optional[datetime]:
     """
     Find the first capture on the grid that falls within a time window.
     Will search across multiple days if needed.
@@ -110,14 +223,29 @@ def find_next_capture_in_window(job: dict, window_start: datetime, start_time: t
         start_time: Window start time (HH:MM)
         end_time: Window end time (HH:MM)
         max_days: Maximum number of days to search
+        not_before: Only return captures after this time (e.g. now, when window_start has passed)
         
     Returns:
         First capture time within any window, or None if no captures fit before job ends
     """
-    end_dt = parse_iso(job['end_datetime']) if job.get('end_datetime') else None
+    schedule = job_schedule(job)
+    end_dt = schedule.end
+    
+    # Window bounds as minutes of day, converted once for every candidate checked below
+    in_window = minutes_window_predicate(minutes_of_day(start_time), minutes_of_day(end_time))
     
-    # Try each day's window
-    for day_offset in range(max_days):
+    # Every day's window closes the same span after it opens (same wall-clock time, same offset),
+    # so the span is worked out once instead of combining a date and a time for each day searched
+    opening_day = window_start.date()
+    close_after = datetime.combine(opening_day, end_time) - datetime.combine(opening_day, window_start.time())
+    
+    # If window crosses midnight
+    if end_time < start_time:
+        close_after += timedelta(days=1)
+    
+    # Try each day's window, going straight to the first one that can still hold the next slot
+    day_offset = 0
+    while day_offset < max_days:
         current_window_start = window_start + timedelta(days=day_offset)
         
         # Check if we've gone past the job's end date
@@ -125,20 +253,20 @@ def find_next_capture_in_window(job: dict, window_start: datetime, start_time: t
             return None
         
         # Calculate window end for this day
-        window_end_time = datetime.combine(current_window_start.date(), end_time)
-        if current_window_start.tzinfo:
-            window_end_time = window_end_time.replace(tzinfo=current_window_start.tzinfo)
-        
-        # If window crosses midnight
-        if end_time < start_time:
-            window_end_time += timedelta(days=1)
+        window_end_time = current_window_start + close_after
         
         # Start looking from just before the window opens
         search_time = current_window_start - timedelta(seconds=1)
         
-        # Look for captures within this specific day's window
-        for _ in range(1000):  # Safety limit per day
-            candidate = calculate_next_capture_on_grid(job, search_time)
+        # ...but never from before not_before - a window that has already opened mustn't hand back a slot gone by
+        if not_before is not None and search_time < not_before:
+            search_time = not_before
+        
+        # Look for captures within this specific day's window. Candidates only move forward
+        # (by at least a second), so the walk ends at the window's end - no iteration cap
+        # that would silently skip the rest of a long window with a short interval
+        while True:
+            candidate = schedule.next_slot(search_time)
             
             if candidate is None:
                 return None
@@ -148,20 +276,50 @@ def find_next_capture_in_window(job: dict, window_start: datetime, start_time: t
                 break
             
             # Check if candidate is within the window
-            if is_time_in_window(candidate.time(), start_time, end_time):
+            if in_window(candidate.time()):
                 return candidate
             
             # Try next time slot
             search_time = candidate
+        
+        # The next slot is past this window. Every window up to (candidate - window end).days - 1 days
+        # later closes before it as well, so skip those days outright - with intervals longer than a
+        # day this is one step per grid slot instead of one per day
+        day_offset += max(1, (candidate - window_end_time).days)
     
+    logger.debug(f"No capture fits a time window within {max_days} days of {to_iso(window_start)}")
     return None
 
 
+@lru_cache(maxsize=1024)
+def _find_next_capture_in_window_cached(
+    start_datetime: str,
+    end_datetime: Optional[str],
+    interval_seconds: int,
+    window_start: datetime,
+    window_tz: Optional[tzinfo],
+    start_time: time,
+    end_time: time,
+    not_before: Optional[datetime] = None
+) -> Optional[datetime]:
+    """
+    find_next_capture_in_window() memoized on the schedule fields it reads.
+    A sleeping job asks for the same window opening on every status pass until it opens.
+    Aware datetimes hash by instant, so window_tz is part of the key (as in utils._format_iso).
+    """
+    grid_job = {
+        'start_datetime': start_datetime,
+        'end_datetime': end_datetime,
+        'interval_seconds': interval_seconds
+    }
+    return find_next_capture_in_window(grid_job, window_start, start_time, end_time, not_before=not_before)
+
+
 def calculate_job_state(
     job: dict,
     reference_time: datetime,
     pending_capture_time: Optional[datetime] = None
-) -> Tuple[JobStatus, Optional[datetime], str]:
+) -> Tuple[JobStatus, Optional[datetime], StateReason]:
     """
     Calculate the correct state for a job with full context awareness.
     
@@ -177,83 +335,76 @@ def calculate_job_state(
         (status, next_capture_time, reason)
         - status: 'active' | 'sleeping' | 'completed' | 'disabled'
         - next_capture_time: When next capture should occur (None if completed)
-        - reason: Human-readable explanation
+        - reason: Human-readable explanation (str() it to render)
     """
     # Disabled jobs stay disabled
     if job.get('status') == 'disabled':
-        return ('disabled', None, 'Job manually disabled')
+        return ('disabled', None, StateReason('Job manually disabled'))
     
-    start_dt = parse_iso(job['start_datetime'])
-    end_dt = parse_iso(job['end_datetime']) if job.get('end_datetime') else None
+    schedule = job_schedule(job)
+    start_dt = schedule.start
+    in_window = schedule.in_window
     
     # Job hasn't started yet
     if reference_time < start_dt:
-        return ('sleeping', start_dt, f'Job starts at {to_iso(start_dt)}')
+        return ('sleeping', start_dt, StateReason('Job starts at {}', start_dt))
     
     # CRITICAL: If there's a pending capture, keep it stable until it's executed
-    # This prevents the scheduler from constantly recalculating on every check
-    if pending_capture_time:
-        # Allow a small grace period (2x interval) for pending captures that just passed
-        # This ensures the scheduler has time to execute before we reschedule
-        grace_period = timedelta(seconds=job['interval_seconds'] * 2)
-        
-        if pending_capture_time > reference_time - grace_period:
-            # Pending capture is either in the future OR just recently passed (within grace period)
-            # Check time window if applicable
-            if job.get('time_window_enabled'):
-                start_time = parse_time_string(job['time_window_start'])
-                end_time = parse_time_string(job['time_window_end'])
-                
-                # Must check BOTH: current time in window AND pending capture in window
-                current_in_window = is_time_in_window(reference_time.time(), start_time, end_time)
-                pending_in_window = is_time_in_window(pending_capture_time.time(), start_time, end_time)
-                
-                if current_in_window and pending_in_window:
-                    return ('active', pending_capture_time, f'Pending capture at {to_iso(pending_capture_time)}')
-                else:
-                    # Either current time or pending capture is outside window - recalculate
-                    pass  # Fall through to recalculation
-            else:
-                # No time window - pending capture is good
-                return ('active', pending_capture_time, f'Pending capture at {to_iso(pending_capture_time)}')
-        
-        # If we get here, pending capture is too old - recalculate
+    # This prevents the scheduler from constantly recalculating on every check.
+    # Allow a small grace period (2x interval) for pending captures that just passed
+    # This ensures the scheduler has time to execute before we reschedule
+    pending_is_recent = (
+        pending_capture_time is not None
+        and pending_capture_time > reference_time - timedelta(seconds=schedule.interval * 2)
+    )
+    
+    # Fast path for the common job without a time window: a recent pending capture is good,
+    # otherwise the job is active until its grid runs out
+    if in_window is None:
+        if pending_is_recent:
+            return ('active', pending_capture_time, StateReason('Pending capture at {}', pending_capture_time))
+        next_capture = schedule.next_slot(reference_time)
+        if next_capture is None:
+            return ('completed', None, StateReason('No more captures scheduled'))
+        return ('active', next_capture, StateReason('Active, next capture at {}', next_capture))
+    
+    # Time-windowed job from here on
+    current_in_window = in_window(reference_time.time())
+    
+    # Must check BOTH: current time in window AND pending capture in window,
+    # otherwise (or if the pending capture is too old) recalculate
+    if pending_is_recent and current_in_window and in_window(pending_capture_time.time()):
+        return ('active', pending_capture_time, StateReason('Pending capture at {}', pending_capture_time))
     
     # Calculate next capture on grid
-    next_capture = calculate_next_capture_on_grid(job, reference_time)
+    next_capture = schedule.next_slot(reference_time)
     
     # No more captures possible (past end_datetime or other issue)
     if next_capture is None:
-        return ('completed', None, 'No more captures scheduled')
+        return ('completed', None, StateReason('No more captures scheduled'))
     
-    # Apply time window logic if enabled
-    if job.get('time_window_enabled'):
-        start_time = parse_time_string(job['time_window_start'])
-        end_time = parse_time_string(job['time_window_end'])
-        
-        # Check if we are CURRENTLY in the time window
-        current_in_window = is_time_in_window(reference_time.time(), start_time, end_time)
-        next_capture_in_window = is_time_in_window(next_capture.time(), start_time, end_time)
-        
-        if current_in_window and next_capture_in_window:
-            # We're in the window now and next capture is also in window - job is active
-            return ('active', next_capture, f'Active, next capture at {to_iso(next_capture)}')
-        else:
-            # Either we're outside window, or next capture is outside window
-            # Calculate when window next opens
-            next_window_start = calculate_next_window_start(reference_time, start_time, end_time)
-            
-            # Find first capture that falls within the window
-            window_capture = find_next_capture_in_window(job, next_window_start, start_time, end_time)
-            
-            if window_capture is None:
-                # No captures before job ends
-                return ('completed', None, 'Job ends before next window')
-            
-            return ('sleeping', window_capture, f'Outside time window, next capture at {to_iso(window_capture)}')
+    if current_in_window and in_window(next_capture.time()):
+        # We're in the window now and next capture is also in window - job is active
+        return ('active', next_capture, StateReason('Active, next capture at {}', next_capture))
+    
+    # Either we're outside window, or next capture is outside window
+    # Calculate when window next opens
+    start_time, end_time = schedule.window
+    next_window_start = calculate_next_window_start(reference_time, start_time, end_time)
     
-    # No time window - job is active if there's a next capture
-    return ('active', next_capture, f'Active, next capture at {to_iso(next_capture)}')
+    # Find first capture that falls within the window, and after now. The opening is normally in the
+    # future, so reference_time only joins the cache key in the odd case where it isn't
+    window_capture = _find_next_capture_in_window_cached(
+        job['start_datetime'], job.get('end_datetime'), job['interval_seconds'],
+        next_window_start, next_window_start.tzinfo, start_time, end_time,
+        reference_time if next_window_start <= reference_time else None
+    )
+    
+    if window_capture is None:
+        # No captures before job ends
+        return ('completed', None, StateReason('Job ends before next window'))
+    
+    return ('sleeping', window_capture, StateReason('Outside time window, next capture at {}', window_capture))
 
 
 def should_execute_capture(job: dict, scheduled_time: datetime, current_time: datetime) -> Tuple[bool, str]:
@@ -271,8 +422,8 @@ def should_execute_capture(job: dict, scheduled_time: datetime, current_time: da
     Returns:
         (should_execute, reason)
     """
-    start_dt = parse_iso(job['start_datetime'])
-    end_dt = parse_iso(job['end_datetime']) if job.get('end_datetime') else None
+    schedule = job_schedule(job)
+    start_dt, end_dt = schedule.start, schedule.end
     
     # Check if scheduled time is within job's valid range
     if scheduled_time < start_dt:
@@ -282,11 +433,8 @@ def should_execute_capture(job: dict, scheduled_time: datetime, current_time: da
         return (False, 'Scheduled after job end')
     
     # For time-windowed jobs, verify scheduled time was within window
-    if job.get('time_window_enabled'):
-        start_time = parse_time_string(job['time_window_start'])
-        end_time = parse_time_string(job['time_window_end'])
-        
-        if not is_time_in_window(scheduled_time.time(), start_time, end_time):
+    if schedule.in_window:
+        if not schedule.in_window(scheduled_time.time()):
             return (False, 'Scheduled time was outside time window')
     
     return (True, 'Valid capture')
@@ -93,27 +93,25 @@ def scan_job_files(job_id: int) -> Dict[str, Any]:
             ORDER BY captured_at
         """, (job_id,))
         
-        captures = cursor.fetchall()
-        
         # Build a set of known file paths for quick lookup
         known_files = set()
         missing_files = []
         existing_count = 0
         total_size_recovered = 0
         
-        for capture in captures:
-            capture_dict = dict_from_row(capture)
-            file_path = capture_dict['file_path']
+        # Rows are streamed off the cursor and unpacked in SELECT order - neither a list nor a
+        # per-capture dict is built for the job's whole history
+        for capture_id, file_path, file_size, captured_at in cursor:
             known_files.add(file_path)
             
             if not os.path.exists(file_path):
                 missing_files.append({
-                    'id': capture_dict['id'],
+                    'id': capture_id,
                     'file_path': file_path,
-                    'file_size': capture_dict['file_size'],
-                    'captured_at': capture_dict['captured_at']
+                    'file_size': file_size,
+                    'captured_at': captured_at
                 })
-                total_size_recovered += capture_dict['file_size']
+                total_size_recovered += file_size
             else:
                 existing_count += 1
         
@@ -143,7 +141,7 @@ def scan_job_files(job_id: int) -> Dict[str, Any]:
         result = {
             'job_id': job_id,
             'job_name': job['name'],
-            'total_captures': len(captures),
+            'total_captures': existing_count + len(missing_files),
             'missing_files': missing_files,
             'missing_count': len(missing_files),
             'orphaned_files': orphaned_files,
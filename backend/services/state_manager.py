@@ -8,7 +8,7 @@ import logging
 
 from ..database import get_db
 from ..utils import get_now, to_iso, parse_iso
-from .job_state import calculate_job_state as calculate_state
+from .job_state import calculate_job_state as calculate_state, StateReason
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,7 @@ class StateManager:
     """
     
     @staticmethod
-    def calculate_job_state(job: dict, reference_time: Optional[datetime] = None) -> Tuple[JobStatus, Optional[datetime], Optional[str]]:
+    def calculate_job_state(job: dict, reference_time: Optional[datetime] = None) -> Tuple[JobStatus, Optional[datetime], StateReason]:
         """
         Calculate the correct state for a job based on current conditions.
         
@@ -176,7 +176,7 @@ class StateManager:
         return {
             'status': status,
             'next_capture': to_iso(next_capture) if next_capture else None,
-            'reason': reason,
+            'reason': str(reason),
             'is_running': status in ('active', 'sleeping'),
             'can_capture_now': should_capture and status == 'active'
         }
@@ -194,6 +194,6 @@ def update_video_state(video_id: int, status: VideoStatus, progress: float = 0,
     return StateManager.update_video_state(video_id, status, progress, message, **kwargs)
 
 
-def calculate_job_state(job: dict, reference_time: Optional[datetime] = None) -> Tuple[JobStatus, Optional[datetime], Optional[str]]:
+def calculate_job_state(job: dict, reference_time: Optional[datetime] = None) -> Tuple[JobStatus, Optional[datetime], StateReason]:
     """Calculate job state - convenience wrapper"""
     return StateManager.calculate_job_state(job, reference_time)
@@ -2,8 +2,10 @@
 Thumbnail generation service - creates small preview images for captures
 """
 import os
+import queue
 import subprocess
 import hashlib
+import threading
 from typing import Optional
 import logging
 from PIL import Image
@@ -14,6 +16,11 @@ THUMBNAIL_SIZE = (384, 216)  # 16:9 aspect ratio for better quality
 THUMBNAIL_FORMAT = "webp"
 THUMBNAIL_QUALITY = 75
 
+# Thumbnails of new captures are made by one background thread, off the capture workers
+_thumbnail_queue: "queue.Queue[str]" = queue.Queue()
+_thumbnail_thread: Optional[threading.Thread] = None
+_thumbnail_thread_lock = threading.Lock()
+
 
 def get_thumbnail_path(image_path: str) -> str:
     """
@@ -74,7 +81,7 @@ def generate_thumbnail(image_path: str, force: bool = False) -> tuple[bool, Opti
     thumbnail_path = get_thumbnail_path(image_path)
     
     # Skip if thumbnail already exists and force is False
-    if os.path.exists(thumbnail_path) and not force:
+    if not force and os.path.exists(thumbnail_path):
         return True, None
     
     try:
@@ -102,6 +109,33 @@ def generate_thumbnail(image_path: str, force: bool = False) -> tuple[bool, Opti
         return False, str(e)
 
 
+def queue_thumbnail(image_path: str) -> None:
+    """
+    Generate (or regenerate) a thumbnail in the background and return immediately.
+    A thumbnail requested before it is ready is generated on the spot by the API.
+    
+    Args:
+        image_path: Path to the original image
+    """
+    global _thumbnail_thread
+    if _thumbnail_thread is None:
+        with _thumbnail_thread_lock:
+            if _thumbnail_thread is None:
+                _thumbnail_thread = threading.Thread(target=_thumbnail_worker, name="thumbnail-worker", daemon=True)
+                _thumbnail_thread.start()
+    _thumbnail_queue.put(image_path)
+
+
+def _thumbnail_worker() -> None:
+    """Drain the thumbnail queue for the life of the process"""
+    while True:
+        image_path = _thumbnail_queue.get()
+        try:
+            generate_thumbnail(image_path, force=True)
+        except Exception as e:
+            logger.error(f"Background thumbnail generation failed for {image_path}: {e}")
+
+
 def generate_thumbnail_ffmpeg(image_path: str, force: bool = False) -> tuple[bool, Optional[str]]:
     """
     Generate a thumbnail using ffmpeg (alternative method)
@@ -119,7 +153,7 @@ def generate_thumbnail_ffmpeg(image_path: str, force: bool = False) -> tuple[boo
     thumbnail_path = get_thumbnail_path(image_path)
     
     # Skip if thumbnail already exists and force is False
-    if os.path.exists(thumbnail_path) and not force:
+    if not force and os.path.exists(thumbnail_path):
         return True, None
     
     try:
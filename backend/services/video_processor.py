@@ -3,8 +3,10 @@ Video processing service - builds timelapse videos from captured images
 """
 import subprocess
 import os
+import queue
+import threading
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
 from ..database import get_db
@@ -12,6 +14,64 @@ from .. import config
 
 logger = logging.getLogger(__name__)
 
+# Videos are encoded by MAX_CONCURRENT_ENCODES dedicated threads; further videos wait in
+# 'processing' at 0% in the queue, without holding a thread of the request pool
+_encode_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+_encode_threads: List[threading.Thread] = []
+_encode_threads_lock = threading.Lock()
+
+# Request key -> video_id for encodes queued or running, so duplicate requests can reuse them
+_encodes_in_progress: Dict[tuple, int] = {}
+_encodes_lock = threading.Lock()
+
+
+def get_encode_in_progress(encode_key: tuple) -> Optional[int]:
+    """Return the video_id of a queued/running encode for this request key, if any"""
+    with _encodes_lock:
+        return _encodes_in_progress.get(encode_key)
+
+
+def register_encode(encode_key: tuple, video_id: int) -> None:
+    """Record a queued encode; process_video releases it when done"""
+    with _encodes_lock:
+        _encodes_in_progress[encode_key] = video_id
+
+
+def _release_encode(encode_key: tuple, video_id: int) -> None:
+    """Forget an encode, unless the key has since been taken by another video"""
+    with _encodes_lock:
+        if _encodes_in_progress.get(encode_key) == video_id:
+            del _encodes_in_progress[encode_key]
+
+
+def queue_video(**kwargs: Any) -> None:
+    """
+    Queue a video for encoding by the encode workers, started on first use.
+    Takes process_video()'s arguments; returns straight away.
+    """
+    if not _encode_threads:
+        with _encode_threads_lock:
+            if not _encode_threads:
+                for i in range(config.MAX_CONCURRENT_ENCODES):
+                    thread = threading.Thread(target=_encode_worker, name=f"encode-worker-{i}", daemon=True)
+                    thread.start()
+                    _encode_threads.append(thread)
+    if _encode_queue.unfinished_tasks >= len(_encode_threads):
+        logger.info(f"Video {kwargs['video_id']} waiting for a free encode slot")
+    _encode_queue.put(kwargs)
+
+
+def _encode_worker() -> None:
+    """Encode queued videos one at a time for the life of the process"""
+    while True:
+        kwargs = _encode_queue.get()
+        try:
+            process_video(**kwargs)
+        except Exception as e:
+            logger.error(f"Background encode failed for video {kwargs.get('video_id')}: {e}")
+        finally:
+            _encode_queue.task_done()
+
 
 def process_video(
     video_id: int,
@@ -23,7 +83,8 @@ def process_video(
     end_capture_id: Optional[int],
     start_time: Optional[str],
     end_time: Optional[str],
-    output_path: str
+    output_path: str,
+    encode_key: Optional[tuple] = None
 ):
     """
     Process a timelapse video from captured images
@@ -39,6 +100,7 @@ def process_video(
         start_time: Start timestamp for captures (optional)
         end_time: End timestamp for captures (optional)
         output_path: Path to save the output video
+        encode_key: Deduplication key registered by the caller (optional), released when done
     """
     try:
         logger.info(f"Starting video processing for video_id={video_id}")
@@ -187,6 +249,9 @@ def process_video(
     except Exception as e:
         logger.error(f"Error processing video {video_id}: {e}")
         _update_video_status(video_id, 'failed', 0, str(e))
+    finally:
+        if encode_key is not None:
+            _release_encode(encode_key, video_id)
 
 
 def _update_progress(video_id: int, progress: float):
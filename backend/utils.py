@@ -1,7 +1,9 @@
 """
 Utility functions for timezone-aware datetime handling
 """
-from datetime import datetime
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Optional
 from zoneinfo import ZoneInfo
 import os
 
@@ -44,16 +46,28 @@ def to_iso(dt: datetime) -> str:
     Returns:
         str: ISO format string
     """
-    if dt.tzinfo is None:
+    return _format_iso(dt, dt.tzinfo, dt.fold)
+
+
+@lru_cache(maxsize=4096)
+def _format_iso(dt: datetime, tz: Optional[tzinfo], fold: int) -> str:
+    """
+    Memoized body of to_iso.
+    Aware datetimes hash by instant, so tzinfo and fold are part of the key to keep
+    the same instant in different zones (or either side of a DST fold) apart.
+    """
+    if tz is None:
         # If naive, assume it's in the local timezone
         dt = dt.replace(tzinfo=get_local_timezone())
     return dt.isoformat()
 
 
+@lru_cache(maxsize=4096)
 def parse_iso(iso_string: str) -> datetime:
     """
     Parse ISO format string to timezone-aware datetime.
     If the string doesn't have timezone info, assumes local timezone.
+    Results are cached - job rows repeat the same timestamps on every read.
     
     Args:
         iso_string: ISO format datetime string
@@ -0,0 +1,95 @@
+"""
+Tests for the job state calculator - time windows that cross midnight
+"""
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+
+from backend.services.job_state import (
+    calculate_job_state,
+    calculate_next_window_start,
+    find_next_capture_in_window,
+)
+from backend.utils import parse_iso, to_iso
+
+TZ = timezone(timedelta(hours=2))
+OVERNIGHT = (time(22, 0), time(6, 0))
+
+
+def overnight_job(start: datetime) -> dict:
+    return {
+        'id': 1,
+        'name': 'overnight',
+        'status': 'active',
+        'start_datetime': to_iso(start),
+        'end_datetime': None,
+        'interval_seconds': 60,
+        'time_window_enabled': 1,
+        'time_window_start': '22:00',
+        'time_window_end': '06:00',
+    }
+
+
+@pytest.mark.parametrize('now, expected', [
+    # Daytime gap: tonight's opening, not last night's
+    (datetime(2024, 3, 5, 10, 30, tzinfo=TZ), datetime(2024, 3, 5, 22, 0, tzinfo=TZ)),
+    # After midnight, inside the window that opened yesterday: tonight's opening
+    (datetime(2024, 3, 5, 2, 15, tzinfo=TZ), datetime(2024, 3, 5, 22, 0, tzinfo=TZ)),
+    # Evening, inside tonight's window: tomorrow's opening
+    (datetime(2024, 3, 5, 23, 15, tzinfo=TZ), datetime(2024, 3, 6, 22, 0, tzinfo=TZ)),
+])
+def test_next_window_start_for_overnight_window(now, expected):
+    assert calculate_next_window_start(now, *OVERNIGHT) == expected
+
+
+def test_overnight_window_sleeps_until_tonight_during_the_day():
+    now = datetime(2024, 3, 5, 10, 30, 15, tzinfo=TZ)
+    job = overnight_job(now - timedelta(days=3))
+    
+    status, next_capture, _ = calculate_job_state(job, now)
+    
+    assert status == 'sleeping'
+    assert next_capture == datetime(2024, 3, 5, 22, 0, 15, tzinfo=TZ)
+    # Evaluating again at the same time keeps the same (future) capture
+    assert calculate_job_state(job, now, next_capture)[1] == next_capture
+
+
+def test_overnight_window_next_capture_is_never_in_the_past():
+    start = datetime(2024, 3, 1, 0, 0, 7, tzinfo=TZ)
+    job = overnight_job(start)
+    
+    now = datetime(2024, 3, 5, 0, 0, tzinfo=TZ)
+    while now < datetime(2024, 3, 6, 0, 0, tzinfo=TZ):
+        status, next_capture, _ = calculate_job_state(job, now)
+        assert status in ('active', 'sleeping')
+        assert next_capture > now
+        now += timedelta(minutes=7)
+
+
+def test_window_search_from_a_past_opening_stays_after_not_before():
+    # Grid in +05:30, window opening and "now" in -06:00: the opening a day back would
+    # otherwise give the grid's first in-window slot, 12:00+05:30, hours before now
+    job = {'start_datetime': '2024-01-09T04:16:00+05:30', 'end_datetime': None, 'interval_seconds': 10}
+    now = parse_iso('2024-01-09T05:45:21-06:00')
+    past_opening = parse_iso('2024-01-08T12:00:00-06:00')
+    
+    next_capture = find_next_capture_in_window(job, past_opening, time(12, 0), time(3, 15), not_before=now)
+    
+    assert next_capture == parse_iso('2024-01-09T23:30:00+05:30')
+
+
+def test_scheduler_never_queues_a_past_check_for_a_sleeping_job(monkeypatch):
+    pytest.importorskip('PIL')
+    from backend.services import capture_scheduler
+    
+    now = datetime(2024, 3, 5, 10, 30, tzinfo=TZ)
+    past = now - timedelta(hours=12)
+    job = overnight_job(now - timedelta(days=3))
+    job.update(status='sleeping', next_scheduled_capture_at=to_iso(past), warning_message=None)
+    
+    # Whatever the calculator says, a past time must not go back on the queue
+    monkeypatch.setattr(capture_scheduler, 'calculate_job_state', lambda *args: ('sleeping', past, 'stale'))
+    scheduler = capture_scheduler.CaptureScheduler()
+    update, next_check = scheduler._update_job_status(job, now, to_iso(now), {})
+    
+    assert next_check is None